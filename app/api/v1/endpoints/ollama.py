@@ -1,21 +1,27 @@
 """Ollama API endpoints."""
 
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List
 import logging
-import json
-import re
-
-from app.schemas.ollama import (
-    ChatRequest,
-    ChatResponse,
-    ModelInfo,
-    ModelsResponse,
-    ErrorResponse,
-    WorkoutPlan,
-)
+from typing import List
+from typing import Optional
+
+from fastapi import APIRouter
+from fastapi import Depends
+from fastapi import Header
+from fastapi import HTTPException
+
+from app.core.deadline import Deadline
+from app.core.deadline import DeadlineExceeded
+from app.schemas.ollama import ChatRequest
+from app.schemas.ollama import ChatResponse
+from app.schemas.ollama import ErrorResponse
+from app.schemas.ollama import ModelInfo
+from app.schemas.ollama import ModelsResponse
+from app.schemas.ollama import PlanEditRequest
+from app.schemas.ollama import PlanEditResponse
+from app.schemas.ollama import WorkoutPlan
 from app.services.ollama import ollama_service
-from app.services.agenta import agenta_service
+from app.services.workout import workout_service
+
 
 logger = logging.getLogger(__name__)
 
@@ -23,7 +29,10 @@ router = APIRouter(prefix="/ollama", tags=["ollama"])
 
 
 @router.post("/chat", response_model=WorkoutPlan)
-async def chat(request: ChatRequest):
+async def chat(
+    request: ChatRequest,
+    x_request_deadline_ms: Optional[int] = Header(None, ge=1),
+):
     """
     Generate a workout plan based on user parameters.
 
@@ -38,78 +47,53 @@ async def chat(request: ChatRequest):
     - **temperature**: Control randomness (0.0 to 2.0)
     - **max_tokens**: Maximum tokens in response
     - **stream**: Whether to stream the response
+    - **deadline_ms**: Milliseconds the caller will wait (also accepted as the
+      `X-Request-Deadline-Ms` header; the tighter of the two wins)
     """
+    deadline = Deadline.from_ms(request.deadline_ms, x_request_deadline_ms)
     try:
-        # Get structured messages from Agenta
-        messages = await agenta_service.get_messages()
-
-        # Template the user message with actual data
-        user_template = None
-        system_message = None
-
-        # Extract system and user messages from Agenta
-        for msg in messages:
-            if msg["role"] == "system":
-                system_message = msg
-            elif msg["role"] == "user":
-                user_template = msg["content"]
-
-        if not user_template:
-            raise ValueError("No user message template found in Agenta configuration")
-
-        # Use safe string replacement to avoid conflicts with JSON braces
-        templated_user_message = user_template
-
-        # Replace template placeholders (use {{variable}} format to avoid JSON conflicts)
-        replacements = {
-            "{{age}}": str(request.age),
-            "{{height}}": str(request.height),
-            "{{weight}}": str(request.weight),
-            "{{physical_condition}}": request.physical_condition,
-            "{{sessions_per_week}}": str(request.sessions_per_week),
-            "{{workout_time}}": str(request.workout_time),
-            "{{available_machines}}": ", ".join(request.available_machines),
-        }
-
-        for placeholder, value in replacements.items():
-            templated_user_message = templated_user_message.replace(placeholder, value)
-
-        logger.debug(f"Templated user message: {templated_user_message}")
-
-        # Build final messages array
-        final_messages = []
-        if system_message:
-            final_messages.append(system_message)
-        final_messages.append({"role": "user", "content": templated_user_message})
-
-        # Use structured outputs with Pydantic schema
-        workout_schema = WorkoutPlan.model_json_schema()
-
-        response = await ollama_service.chat_with_system(
-            final_messages,
-            request.model,
-            request.temperature,
-            request.max_tokens,
-            format_schema=workout_schema,
-        )
-
-        # Parse the JSON response and return as structured data
-        try:
-            workout_data = json.loads(response.response)
-            workout_plan = WorkoutPlan(**workout_data)
-            logger.info("Successfully parsed workout plan from Ollama response")
-            return workout_plan
-        except (json.JSONDecodeError, ValueError) as e:
-            logger.error(f"Failed to parse workout plan JSON: {e}")
-            raise HTTPException(
-                status_code=500, detail="Failed to parse workout plan from AI response"
-            )
-
+        return await workout_service.generate_plan(request, deadline)
+    except DeadlineExceeded as e:
+        logger.warning(f"Chat request refused: {e}")
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         logger.error(f"Chat endpoint error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/chat/edit", response_model=PlanEditResponse)
+async def edit_chat_plan(
+    edit: PlanEditRequest,
+    x_request_deadline_ms: Optional[int] = Header(None, ge=1),
+):
+    """
+    Apply a change to an existing workout plan without regenerating the week.
+
+    Only the days affected by the change are regenerated; the others are
+    reused and passed to the model as context.
+
+    - **plan**: Workout plan to edit
+    - **available_machines**: Machines available when the plan was generated
+    - **remove_machines**: Machines that are no longer available
+    - **add_machines**: Machines that became available
+    - **workout_time**: New workout duration in minutes
+    - **day**: Day to regenerate; limits `workout_time` to this day
+    - **model**: Optional model to use (defaults to configured model)
+    - **temperature**: Control randomness (0.0 to 2.0)
+    - **deadline_ms**: Milliseconds the caller will wait (also accepted as the
+      `X-Request-Deadline-Ms` header)
+    """
+    deadline = Deadline.from_ms(edit.deadline_ms, x_request_deadline_ms)
+    try:
+        return await workout_service.edit_plan(edit, deadline)
+    except DeadlineExceeded as e:
+        logger.warning(f"Plan edit refused: {e}")
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        logger.error(f"Plan edit endpoint error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/models", response_model=ModelsResponse)
 async def list_models():
     """
@@ -4,6 +4,7 @@ from fastapi import APIRouter
 
 from app.api.v1.endpoints import ollama
 
+
 # Create the main API v1 router
 router = APIRouter(prefix="/api/v1")
 
@@ -1,8 +1,12 @@
 """Application configuration using environment variables."""
 
 import os
-from typing import List, Optional
-from pydantic_settings import BaseSettings, SettingsConfigDict
+from typing import List
+from typing import Literal
+from typing import Optional
+
+from pydantic_settings import BaseSettings
+from pydantic_settings import SettingsConfigDict
 
 
 class Settings(BaseSettings):
@@ -27,6 +31,53 @@ class Settings(BaseSettings):
     OLLAMA_DEFAULT_MODEL: str = "llama3"
     OLLAMA_TIMEOUT: int = 30
     OLLAMA_MAX_RETRIES: int = 3
+    OLLAMA_MAX_CONCURRENCY: int = 4
+    SCHEDULER_MAX_BATCH: int = 8
+    SCHEDULER_MAX_WAIT: float = 10.0
+    SCHEDULER_RESIDENT_TTL: float = 5.0
+    # Generate short-key plans without the user profile and expand them
+    OLLAMA_COMPACT_SCHEMA: bool = False
+    # Comma-separated models tried smallest first when a request names none
+    OLLAMA_MODEL_CASCADE: str = ""
+
+    # Generation budget settings
+    ADAPTIVE_NUM_PREDICT: bool = True
+    # Initial estimate of output tokens per hour of planned sessions
+    PLAN_TOKENS_PER_HOUR: int = 300
+    PLAN_TOKENS_OVERHEAD: int = 150
+    PLAN_TOKENS_STDDEVS: float = 2.0
+    PLAN_STATS_ALPHA: float = 0.1
+
+    # Plan routing: "llm", "rules", "rules_then_llm" or "auto"
+    PLAN_ROUTING: Literal["llm", "rules", "rules_then_llm", "auto"] = "llm"
+    PLAN_CACHE_SIZE: int = 1024
+
+    # Exercise catalog settings
+    EXERCISE_CATALOG_PATH: Optional[str] = None
+    EXERCISE_INDEX_PATH: Optional[str] = None
+    CATALOG_MIN_SIMILARITY: float = 0.7
+    # Required lead of the best machine over the next best one
+    CATALOG_MIN_MARGIN: float = 0.15
+    EXERCISE_SHORTLIST_SIZE: int = 4
+
+    # Training data capture settings
+    CAPTURE_ENABLED: bool = False
+    CAPTURE_DIR: str = "./captures"
+    CAPTURE_BUFFER_SIZE: int = 10000
+    CAPTURE_BATCH_SIZE: int = 100
+    CAPTURE_FLUSH_INTERVAL: float = 5.0
+    CAPTURE_SHARD_MAX_RECORDS: int = 10000
+
+    # Cross-worker coordination: "process" (none), "local" or "redis"
+    COORDINATION_BACKEND: str = "process"
+    COORDINATION_DIR: Optional[str] = None
+    COORDINATION_REDIS_URL: str = "redis://localhost:6379/0"
+    COORDINATION_NAMESPACE: str = "train-ai"
+    COORDINATION_POLL_INTERVAL: float = 0.02
+    COORDINATION_SLOT_LEASE: float = 300.0
+    COORDINATION_CACHE_SIZE: int = 10000
+    PROMPT_CACHE_TTL: float = 300.0
+    PLAN_CACHE_TTL: float = 86400.0
 
     # Other optional settings
     ALLOWED_HOSTS: str = "*"
@@ -0,0 +1,60 @@
+"""Request deadlines propagated through queueing, retries and upstream calls."""
+
+import time
+from typing import Optional
+
+from prometheus_client import Counter
+from prometheus_client import Histogram
+
+
+DEADLINE_REMAINING = Histogram(
+    "train_ai_deadline_remaining_seconds",
+    "Remaining request budget when a stage starts",
+    ["stage"],
+    buckets=(0.1, 0.5, 1, 2, 5, 10, 20, 30, 60, 120),
+)
+DEADLINE_REJECTIONS = Counter(
+    "train_ai_deadline_rejections_total",
+    "Requests refused because their deadline could not be met",
+    ["stage"],
+)
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request cannot complete before its deadline."""
+
+    def __init__(self, stage: str, message: Optional[str] = None):
+        self.stage = stage
+        super().__init__(message or f"Request deadline exceeded during {stage}")
+
+
+class Deadline:
+    """Absolute point in (monotonic) time by which a request must finish."""
+
+    def __init__(self, timeout: float):
+        self.expires_at = time.monotonic() + timeout
+
+    @classmethod
+    def from_ms(cls, *timeouts_ms: Optional[int]) -> Optional["Deadline"]:
+        """Build a deadline from the tightest of the given millisecond budgets."""
+        budgets = [t for t in timeouts_ms if t is not None]
+        if not budgets:
+            return None
+        return cls(min(budgets) / 1000)
+
+    def remaining(self) -> float:
+        """Seconds left before the deadline, never negative."""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def observe(self, stage: str) -> float:
+        """Record the remaining budget at ``stage`` and fail if none is left."""
+        remaining = self.remaining()
+        DEADLINE_REMAINING.labels(stage=stage).observe(remaining)
+        if remaining <= 0:
+            self.reject(stage)
+        return remaining
+
+    def reject(self, stage: str, message: Optional[str] = None) -> None:
+        """Count an early rejection at ``stage`` and raise ``DeadlineExceeded``."""
+        DEADLINE_REJECTIONS.labels(stage=stage).inc()
+        raise DeadlineExceeded(stage, message)
@@ -0,0 +1,85 @@
+"""Compressed, rotated JSONL shard files."""
+
+import gzip
+import json
+import re
+from pathlib import Path
+from typing import Any
+from typing import Dict
+from typing import Iterator
+from typing import Optional
+from typing import TextIO
+
+
+class ShardWriter:
+    """Append JSON records to gzip-compressed JSONL shards.
+
+    A new shard is started every ``max_records`` records. Shard numbering
+    continues after the highest shard already present in ``directory``, so
+    a writer never reopens (and never corrupts) a shard left behind by an
+    earlier, possibly interrupted, run.
+    """
+
+    def __init__(self, directory: Path, prefix: str, max_records: int = 10000):
+        self.directory = Path(directory)
+        self.prefix = prefix
+        self.max_records = max_records
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._pattern = re.compile(rf"^{re.escape(prefix)}-(\d+)\.jsonl\.gz$")
+        self._index = self._next_index()
+        self._file: Optional[TextIO] = None
+        self._records = 0
+
+    def _next_index(self) -> int:
+        """Return the index following the last existing shard."""
+        indexes = [
+            int(match.group(1))
+            for match in map(
+                self._pattern.match, (p.name for p in self.directory.iterdir())
+            )
+            if match
+        ]
+        return max(indexes, default=-1) + 1
+
+    @property
+    def current_path(self) -> Path:
+        """Path of the shard currently being written."""
+        return self.directory / f"{self.prefix}-{self._index:05d}.jsonl.gz"
+
+    def write(self, record: Dict[str, Any]) -> None:
+        """Write one record, rotating to a new shard when the current is full."""
+        if self._file is not None and self._records >= self.max_records:
+            self.close()
+            self._index += 1
+        if self._file is None:
+            self._file = gzip.open(self.current_path, "wt", encoding="utf-8")
+            self._records = 0
+        self._file.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self._records += 1
+
+    def flush(self) -> None:
+        """Flush buffered records so they survive a crash of the process."""
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self) -> None:
+        """Close the current shard."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def iter_shards(directory: Path, prefix: str) -> Iterator[Dict[str, Any]]:
+    """Stream records from every shard in ``directory`` in shard order.
+
+    A truncated trailing record, as left by a killed writer, ends the shard
+    instead of failing the whole read.
+    """
+    for path in sorted(Path(directory).glob(f"{prefix}-*.jsonl.gz")):
+        with gzip.open(path, "rt", encoding="utf-8") as shard:
+            try:
+                for line in shard:
+                    if line.strip():
+                        yield json.loads(line)
+            except (EOFError, gzip.BadGzipFile, json.JSONDecodeError):
+                continue
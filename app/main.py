@@ -1,14 +1,18 @@
 """Main FastAPI application entry point."""
 
 import logging
+import os
+import time
+from contextlib import asynccontextmanager
+
+import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-import uvicorn
-import os
-import agenta as ag
+from prometheus_client import make_asgi_app
 
 from app.core.config import settings
 
+
 # Configure logging for the entire application
 logging.basicConfig(
     level=getattr(logging, settings.LOG_LEVEL.upper()),
@@ -16,6 +20,44 @@ logging.basicConfig(
 )
 
 from app.api.v1.router import router as api_v1_router
+from app.services.agenta import agenta_service
+from app.services.capture import capture_service
+from app.services.catalog import exercise_catalog
+from app.services.coordination import coordinator
+
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Initialize per-process resources at startup.
+
+    Runs in each worker after it is forked. Imports and the exercise index
+    are shared copy-on-write when ``train-ai serve`` preloads them in the
+    master; what cannot be shared, such as the Agenta connection, goes here.
+    """
+    timings = {}
+
+    started = time.perf_counter()
+    agenta_service.init()
+    timings["agenta"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    exercise_catalog.load()
+    timings["catalog"] = time.perf_counter() - started
+
+    app.state.startup_timings = timings
+    logger.info(
+        "Startup took "
+        + ", ".join(f"{step} {seconds:.3f}s" for step, seconds in timings.items())
+    )
+
+    await capture_service.start()
+    yield
+    await capture_service.stop()
+    await coordinator.close()
+
 
 # Create FastAPI app using settings
 app = FastAPI(
@@ -25,6 +67,7 @@ app = FastAPI(
     docs_url="/docs",
     redoc_url="/redoc",
     debug=settings.DEBUG,
+    lifespan=lifespan,
 )
 
 # Add CORS middleware using settings
@@ -39,7 +82,8 @@ app.add_middleware(
 # Include API routers
 app.include_router(api_v1_router)
 
-ag.init()
+# Expose Prometheus metrics
+app.mount("/metrics", make_asgi_app())
 
 
 @app.get("/")
@@ -65,6 +109,12 @@ async def health_check():
     }
 
 
+@app.get("/stats")
+async def get_stats():
+    """Upstream slots and counters aggregated over all workers."""
+    return await coordinator.stats()
+
+
 @app.get("/config")
 async def get_config():
     """Get current configuration (non-sensitive values only)."""
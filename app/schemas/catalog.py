@@ -0,0 +1,35 @@
+"""Pydantic schemas for the exercise catalog."""
+
+from typing import List
+from typing import Optional
+
+from pydantic import BaseModel
+from pydantic import Field
+
+
+class CatalogExercise(BaseModel):
+    """Exercise that can be performed on a catalog machine."""
+
+    name: str = Field(..., description="Exercise name")
+    group: str = Field(..., description="Main muscle group or 'cardio'")
+
+
+class CatalogMachine(BaseModel):
+    """Canonical gym machine with its aliases and exercises."""
+
+    machine: str = Field(..., description="Canonical machine name")
+    aliases: List[str] = Field(default_factory=list, description="Other names")
+    exercises: List[CatalogExercise] = Field(..., description="Exercises")
+
+
+class MachineMatch(BaseModel):
+    """Resolution of a free-text machine name against the catalog."""
+
+    query: str = Field(..., description="Machine name as supplied")
+    machine: Optional[str] = Field(None, description="Canonical machine, if any")
+    score: float = Field(..., description="Cosine similarity of the best match")
+
+    @property
+    def name(self) -> str:
+        """Canonical name when resolved, otherwise the supplied text."""
+        return self.machine or self.query
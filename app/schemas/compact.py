@@ -0,0 +1,99 @@
+"""Token-minimal generation schemas and their lossless expansion."""
+
+from typing import List
+from typing import Literal
+
+from pydantic import BaseModel
+from pydantic import Field
+
+from app.schemas.ollama import ChatRequest
+from app.schemas.ollama import Exercise
+from app.schemas.ollama import UserProfile
+from app.schemas.ollama import WorkoutDay
+from app.schemas.ollama import WorkoutPlan
+
+
+INTENSITY_CODES = {"Low": "L", "Medium": "M", "High": "H"}
+INTENSITY_NAMES = {code: name for name, code in INTENSITY_CODES.items()}
+
+# Appended to the prompt so the model knows what the short keys mean
+COMPACT_FORMAT_INSTRUCTIONS = (
+    "Answer in compact JSON: w=list of training days; per day d=day of the "
+    "week, x=exercises; per exercise m=machine, n=exercise name, s=sets, "
+    "r=reps, t=minutes, i=intensity (L, M or H)."
+)
+COMPACT_DAY_INSTRUCTIONS = (
+    "Answer in compact JSON: d=day of the week, x=exercises; per exercise "
+    "m=machine, n=exercise name, s=sets, r=reps, t=minutes, "
+    "i=intensity (L, M or H)."
+)
+
+
+class CompactExercise(BaseModel):
+    """Exercise with single-letter keys."""
+
+    m: str = Field(..., description="Machine")
+    n: str = Field(..., description="Exercise name")
+    s: int = Field(..., description="Sets")
+    r: int = Field(..., description="Reps")
+    t: int = Field(..., description="Minutes")
+    i: Literal["L", "M", "H"] = Field(..., description="Intensity")
+
+    def expand(self) -> Exercise:
+        """Rebuild the public exercise."""
+        return Exercise(
+            machine=self.m,
+            exercise_name=self.n,
+            sets=self.s,
+            reps=self.r,
+            duration_minutes=self.t,
+            intensity=INTENSITY_NAMES[self.i],
+        )
+
+    @classmethod
+    def from_exercise(cls, exercise: Exercise) -> "CompactExercise":
+        """Encode a public exercise."""
+        return cls(
+            m=exercise.machine,
+            n=exercise.exercise_name,
+            s=exercise.sets,
+            r=exercise.reps,
+            t=exercise.duration_minutes,
+            i=INTENSITY_CODES[exercise.intensity],
+        )
+
+
+class CompactDay(BaseModel):
+    """Workout day with single-letter keys."""
+
+    d: str = Field(..., description="Day of the week")
+    x: List[CompactExercise] = Field(..., description="Exercises")
+
+    def expand(self) -> WorkoutDay:
+        """Rebuild the public workout day."""
+        return WorkoutDay(day=self.d, exercises=[e.expand() for e in self.x])
+
+    @classmethod
+    def from_day(cls, day: WorkoutDay) -> "CompactDay":
+        """Encode a public workout day."""
+        return cls(
+            d=day.day, x=[CompactExercise.from_exercise(e) for e in day.exercises]
+        )
+
+
+class CompactPlan(BaseModel):
+    """Weekly routine only; the user profile is known from the request."""
+
+    w: List[CompactDay] = Field(..., description="Weekly routine")
+
+    def expand(self, request: ChatRequest) -> WorkoutPlan:
+        """Rebuild the public plan, filling the user profile from the request."""
+        user_profile = UserProfile.from_request(request)
+        return WorkoutPlan(
+            user_profile=user_profile, weekly_routine=[d.expand() for d in self.w]
+        )
+
+    @classmethod
+    def from_plan(cls, plan: WorkoutPlan) -> "CompactPlan":
+        """Encode a public plan, dropping the user profile."""
+        return cls(w=[CompactDay.from_day(d) for d in plan.weekly_routine])
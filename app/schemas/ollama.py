@@ -1,7 +1,14 @@
 """Pydantic schemas for Ollama API endpoints."""
 
-from typing import Optional, List, Dict, Any, Literal
-from pydantic import BaseModel, Field
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Literal
+from typing import Optional
+
+from pydantic import BaseModel
+from pydantic import Field
+from pydantic import model_validator
 
 
 class ChatMessage(BaseModel):
@@ -45,6 +52,18 @@ class UserProfile(BaseModel):
         ..., description="Workout duration per session in minutes"
     )
 
+    @classmethod
+    def from_request(cls, request: "ChatRequest") -> "UserProfile":
+        """Build the profile described by a chat request."""
+        return cls(
+            age=request.age,
+            weight=request.weight,
+            height=request.height,
+            physical_condition=request.physical_condition,
+            training_frequency=request.sessions_per_week,
+            workout_time_per_session=request.workout_time,
+        )
+
 
 class WorkoutPlan(BaseModel):
     """Complete workout plan response model."""
@@ -64,9 +83,9 @@ class ChatRequest(BaseModel):
     weight: int = Field(..., description="Weight in kilograms")
     physical_condition: str = Field(..., description="Current physical condition")
     sessions_per_week: int = Field(
-        ..., description="Number of workout sessions per week"
+        ..., ge=1, description="Number of workout sessions per week"
     )
-    workout_time: int = Field(..., description="Workout duration in minutes")
+    workout_time: int = Field(..., ge=1, description="Workout duration in minutes")
     available_machines: List[str] = Field(
         ..., description="List of available gym machines/equipment"
     )
@@ -77,6 +96,11 @@ class ChatRequest(BaseModel):
         None, ge=1, le=4000, description="Maximum tokens in response"
     )
     stream: bool = Field(False, description="Whether to stream the response")
+    deadline_ms: Optional[int] = Field(
+        None,
+        ge=1,
+        description="Milliseconds the caller will wait for the plan",
+    )
 
     class Config:
         """Example request schema."""
@@ -108,6 +132,9 @@ class ChatResponse(BaseModel):
     model: str = Field(..., description="Model used for generation")
     created_at: str = Field(..., description="Response creation timestamp")
     done: bool = Field(..., description="Whether the response is complete")
+    done_reason: Optional[str] = Field(
+        None, description='Why generation stopped, "length" when cut off'
+    )
     total_duration: Optional[int] = Field(
         None, description="Total processing duration in nanoseconds"
     )
@@ -128,6 +155,57 @@ class ChatResponse(BaseModel):
     )
 
 
+class PlanEditRequest(BaseModel):
+    """Request schema for editing an existing workout plan."""
+
+    plan: WorkoutPlan = Field(..., description="Workout plan to edit")
+    available_machines: List[str] = Field(
+        ..., description="Machines available when the plan was generated"
+    )
+    remove_machines: List[str] = Field(
+        default_factory=list, description="Machines that are no longer available"
+    )
+    add_machines: List[str] = Field(
+        default_factory=list, description="Machines that became available"
+    )
+    workout_time: Optional[int] = Field(
+        None,
+        ge=1,
+        description="New workout duration in minutes (for `day` only, if given)",
+    )
+    day: Optional[str] = Field(
+        None, description="Day to regenerate; limits `workout_time` to this day"
+    )
+    model: Optional[str] = Field(
+        None, description="Model to use (defaults to configured model)"
+    )
+    temperature: Optional[float] = Field(
+        None, ge=0.0, le=2.0, description="Temperature for response generation"
+    )
+    deadline_ms: Optional[int] = Field(
+        None,
+        ge=1,
+        description="Milliseconds the caller will wait for the plan",
+    )
+
+    @model_validator(mode="after")
+    def check_day(self) -> "PlanEditRequest":
+        """Reject days that are not part of the plan."""
+        days = {day.day.casefold() for day in self.plan.weekly_routine}
+        if self.day is not None and self.day.casefold() not in days:
+            raise ValueError(f"Day {self.day!r} is not part of the plan")
+        return self
+
+
+class PlanEditResponse(BaseModel):
+    """Response schema for the plan edit endpoint."""
+
+    plan: WorkoutPlan = Field(..., description="Merged workout plan")
+    reused_days: int = Field(..., description="Number of days kept unchanged")
+    regenerated_days: int = Field(..., description="Number of days regenerated")
+    regenerated: List[str] = Field(..., description="Names of regenerated days")
+
+
 class ModelInfo(BaseModel):
     """Model information schema."""
 
@@ -1,10 +1,16 @@
-import agenta as ag
+import hashlib
+import json
 import logging
+from typing import Optional
 
 from app.core.config import settings
+from app.services.coordination import coordinator
+
 
 logger = logging.getLogger(__name__)
 
+PROMPT_CACHE_KEY = "prompt:workout:development"
+
 
 class AgentaService:
     """Agenta service. Used to fetch prompts from Agenta."""
@@ -12,12 +18,48 @@ class AgentaService:
     def __init__(self):
         logger.info("Initializing AgentaService")
         self._prompt = None
+        self._version = None
+        self._initialized = False
+
+    def init(self) -> None:
+        """Initialize the Agenta SDK, once per process.
+
+        The SDK reads its API URL and credentials here, so every entry point
+        that fetches prompts (the API lifespan, the CLI commands) needs it;
+        ``get_prompt`` calls it before the first fetch.
+        """
+        if self._initialized:
+            return
+        # Imported lazily: the SDK takes seconds to import
+        import agenta as ag
+
+        ag.init()
+        self._initialized = True
+
+    @property
+    def prompt_version(self) -> Optional[str]:
+        """Short content hash of the fetched prompt, if any."""
+        if self._prompt is None:
+            return None
+        if self._version is None:
+            encoded = json.dumps(self._prompt, sort_keys=True).encode()
+            self._version = hashlib.sha256(encoded).hexdigest()[:12]
+        return self._version
 
     async def get_prompt(self):
         """Get prompt from Agenta."""
         if self._prompt is None:
+            cached = await coordinator.cache_get(PROMPT_CACHE_KEY)
+            if cached is not None:
+                # Already fetched by another worker
+                self._prompt = json.loads(cached)
+                return self._prompt
+
             logger.info("Fetching prompt from Agenta")
             try:
+                self.init()
+                import agenta as ag
+
                 config = ag.ConfigManager.get_from_registry(
                     app_slug="workout", environment_slug="development"
                 )
@@ -34,6 +76,12 @@ class AgentaService:
                 logger.error(f"Failed to fetch prompt from Agenta: {e}")
                 raise
 
+            # Share the prompt so other workers skip the Agenta round trip
+            coordinator.incr("prompt_fetches")
+            await coordinator.cache_set(
+                PROMPT_CACHE_KEY, json.dumps(self._prompt), settings.PROMPT_CACHE_TTL
+            )
+
         return self._prompt
 
     async def get_messages(self):
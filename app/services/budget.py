@@ -0,0 +1,134 @@
+"""Adaptive generation budget based on observed plan sizes and speeds."""
+
+import logging
+import math
+from typing import Dict
+from typing import Optional
+
+from app.core.config import settings
+from app.schemas.ollama import ChatResponse
+
+
+logger = logging.getLogger(__name__)
+
+
+# Lower bound on the true size of an output cut off at num_predict, relative
+# to the truncated size
+TRUNCATED_GROWTH = 1.5
+
+
+def session_hours(sessions: int, workout_time: int) -> float:
+    """Planned training time, which plan size grows with."""
+    return max(sessions, 1) * max(workout_time, 1) / 60
+
+
+class _ModelStats:
+    """Exponentially weighted statistics for one model."""
+
+    def __init__(self, tokens_per_hour: float):
+        self.samples = 0
+        self.tokens_per_hour = tokens_per_hour
+        self.tokens_per_hour_var = (tokens_per_hour / 2) ** 2
+        self.tokens_per_second: Optional[float] = None
+        self.prompt_seconds: Optional[float] = None
+
+    @staticmethod
+    def _ewma(current: Optional[float], value: float, alpha: float) -> float:
+        return value if current is None else current + alpha * (value - current)
+
+    def update(
+        self, response: ChatResponse, hours: float, alpha: float, truncated: bool
+    ) -> None:
+        """Fold one generation into the statistics.
+
+        The size of an output cut off at ``num_predict`` is unknown but
+        larger than ``eval_count``, so instead of being averaged in it lifts
+        the mean to ``TRUNCATED_GROWTH`` times the truncated size; complete
+        generations pull it back down.
+        """
+        if truncated and response.eval_count and hours:
+            floor = TRUNCATED_GROWTH * response.eval_count / hours
+            self.tokens_per_hour = max(self.tokens_per_hour, floor)
+        elif response.eval_count and hours:
+            value = response.eval_count / hours
+            if self.samples == 0:
+                self.tokens_per_hour = value
+            else:
+                delta = value - self.tokens_per_hour
+                self.tokens_per_hour += alpha * delta
+                self.tokens_per_hour_var = (1 - alpha) * (
+                    self.tokens_per_hour_var + alpha * delta**2
+                )
+            self.samples += 1
+        if response.eval_count and response.eval_duration:
+            rate = response.eval_count / (response.eval_duration / 1e9)
+            self.tokens_per_second = self._ewma(self.tokens_per_second, rate, alpha)
+        if response.prompt_eval_duration is not None:
+            seconds = (
+                response.prompt_eval_duration + (response.load_duration or 0)
+            ) / 1e9
+            self.prompt_seconds = self._ewma(self.prompt_seconds, seconds, alpha)
+
+
+class GenerationBudget:
+    """Size ``num_predict`` and estimate generation time per model.
+
+    Plans grow roughly linearly with the planned training time: the number
+    of sessions times ``workout_time``, which sets how many exercises each
+    day holds. The token budget is the tokens per session hour observed for
+    the model (mean plus a few standard deviations) times that time, plus a
+    fixed allowance for the user profile. Outputs cut off at the budget
+    raise the estimate instead of being ignored. Observed tokens per second
+    turn that budget into an expected duration used to refuse requests whose
+    deadline cannot fit a plan.
+    """
+
+    def __init__(self):
+        self._stats: Dict[str, _ModelStats] = {}
+
+    def _model(self, model: str) -> _ModelStats:
+        if model not in self._stats:
+            self._stats[model] = _ModelStats(settings.PLAN_TOKENS_PER_HOUR)
+        return self._stats[model]
+
+    def num_predict(
+        self,
+        model: str,
+        sessions: int,
+        workout_time: int,
+        max_tokens: Optional[int] = None,
+    ) -> Optional[int]:
+        """Token budget for a plan, capped by the client's ``max_tokens``."""
+        if not settings.ADAPTIVE_NUM_PREDICT:
+            return max_tokens
+        stats = self._model(model)
+        per_hour = stats.tokens_per_hour + settings.PLAN_TOKENS_STDDEVS * math.sqrt(
+            stats.tokens_per_hour_var
+        )
+        hours = session_hours(sessions, workout_time)
+        budget = math.ceil(settings.PLAN_TOKENS_OVERHEAD + hours * per_hour)
+        return min(budget, max_tokens) if max_tokens else budget
+
+    def estimate_seconds(
+        self, model: str, num_predict: Optional[int]
+    ) -> Optional[float]:
+        """Expected seconds to generate ``num_predict`` tokens, if known."""
+        stats = self._model(model)
+        if not num_predict or not stats.tokens_per_second:
+            return None
+        return (stats.prompt_seconds or 0.0) + num_predict / stats.tokens_per_second
+
+    def observe(
+        self, model: str, response: ChatResponse, sessions: int, workout_time: int
+    ) -> None:
+        """Record the size and speed of a generation, complete or cut off."""
+        self._model(model).update(
+            response,
+            session_hours(sessions, workout_time),
+            settings.PLAN_STATS_ALPHA,
+            truncated=response.done_reason == "length",
+        )
+
+
+# Create global budget instance
+generation_budget = GenerationBudget()
@@ -0,0 +1,212 @@
+"""Off-hot-path capture of generations into a training dataset store."""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import uuid
+from collections import deque
+from datetime import datetime
+from datetime import timezone
+from pathlib import Path
+from typing import Any
+from typing import Deque
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import Optional
+
+from prometheus_client import Counter
+
+from app.core.config import settings
+from app.core.shards import ShardWriter
+from app.core.shards import iter_shards
+from app.schemas.ollama import ChatRequest
+from app.schemas.ollama import ChatResponse
+
+
+logger = logging.getLogger(__name__)
+
+SHARD_PREFIX = "captures"
+
+CAPTURED_RECORDS = Counter(
+    "train_ai_capture_records_total",
+    "Generation records captured for the dataset store",
+    ["result"],
+)
+
+
+def prompt_hash(messages: List[Dict[str, str]]) -> str:
+    """Short content hash of the rendered messages sent to the model."""
+    encoded = json.dumps(messages, sort_keys=True).encode()
+    return hashlib.sha256(encoded).hexdigest()[:12]
+
+
+class CaptureService:
+    """Buffer generation records in memory and write them in the background.
+
+    ``record`` only appends to a bounded in-memory buffer, so request
+    latency never waits on disk; records arriving while the buffer is full
+    are dropped and counted. A background task flushes the buffer in
+    batches, every ``CAPTURE_FLUSH_INTERVAL`` seconds or as soon as
+    ``CAPTURE_BATCH_SIZE`` records are waiting, to gzip JSONL shards that
+    rotate every ``CAPTURE_SHARD_MAX_RECORDS`` records. Each process writes
+    its own shards, so several workers can share ``CAPTURE_DIR``.
+    """
+
+    def __init__(self):
+        self._buffer: Deque[Dict[str, Any]] = deque()
+        self._ready: Optional[asyncio.Event] = None
+        self._stopping = False
+        self._task: Optional[asyncio.Task] = None
+        self._writer: Optional[ShardWriter] = None
+
+    @property
+    def running(self) -> bool:
+        """Whether records are currently being captured."""
+        return self._task is not None
+
+    def record(
+        self,
+        kind: str,
+        request: ChatRequest,
+        request_key: str,
+        prompt_version: Optional[str],
+        messages: List[Dict[str, str]],
+        response: ChatResponse,
+        parsed: bool,
+        violations: List[str],
+        output_format: str = "full",
+    ) -> None:
+        """Queue one generation for capture without blocking.
+
+        ``prompt_version`` identifies the Agenta template; ``messages`` are
+        the rendered messages the model actually saw, which also depend on
+        the catalog shortlist, the output format and, for day edits, the
+        locally built prompt. ``output_format`` is ``full`` or ``compact``,
+        the schema the raw output was generated with.
+        """
+        if not self.running:
+            return
+        if len(self._buffer) >= settings.CAPTURE_BUFFER_SIZE:
+            CAPTURED_RECORDS.labels(result="dropped").inc()
+            return
+
+        self._buffer.append(
+            {
+                "id": uuid.uuid4().hex,
+                "captured_at": datetime.now(timezone.utc).isoformat(),
+                "kind": kind,
+                "request_key": request_key,
+                "request": request.model_dump(
+                    exclude={"model", "stream", "deadline_ms"}, exclude_none=True
+                ),
+                "prompt_version": prompt_version,
+                "prompt_hash": prompt_hash(messages),
+                "messages": messages,
+                "model": response.model,
+                "format": output_format,
+                "raw_output": response.response,
+                "prompt_eval_count": response.prompt_eval_count,
+                "eval_count": response.eval_count,
+                "total_duration": response.total_duration,
+                "load_duration": response.load_duration,
+                "prompt_eval_duration": response.prompt_eval_duration,
+                "eval_duration": response.eval_duration,
+                "parsed": parsed,
+                "violations": violations,
+            }
+        )
+        if len(self._buffer) >= settings.CAPTURE_BATCH_SIZE:
+            self._ready.set()
+
+    async def start(self) -> None:
+        """Start the background flusher if capture is enabled."""
+        if not settings.CAPTURE_ENABLED or self.running:
+            return
+        self._ready = asyncio.Event()
+        self._stopping = False
+        self._writer = ShardWriter(
+            Path(settings.CAPTURE_DIR),
+            f"{SHARD_PREFIX}-{os.getpid()}",
+            max_records=settings.CAPTURE_SHARD_MAX_RECORDS,
+        )
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Capturing generations to {settings.CAPTURE_DIR}")
+
+    async def stop(self) -> None:
+        """Stop the flusher and write out everything still buffered.
+
+        The flusher is asked to finish rather than cancelled, so a batch
+        being written in its thread always completes before the shard is
+        closed.
+        """
+        if not self.running:
+            return
+        self._stopping = True
+        self._ready.set()
+        await self._task
+        self._task = None
+        await self.flush()
+        self._writer.close()
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(
+                    self._ready.wait(), settings.CAPTURE_FLUSH_INTERVAL
+                )
+            except asyncio.TimeoutError:
+                pass
+            self._ready.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Failed to write captured generations: {e}")
+
+    async def flush(self) -> None:
+        """Write all buffered records to the current shard."""
+        batch = []
+        while self._buffer:
+            batch.append(self._buffer.popleft())
+        if batch:
+            await asyncio.to_thread(self._write, batch)
+
+    def _write(self, batch: List[Dict[str, Any]]) -> None:
+        for record in batch:
+            self._writer.write(record)
+        self._writer.flush()
+        CAPTURED_RECORDS.labels(result="written").inc(len(batch))
+
+
+def export_dataset(
+    directory: Path, valid_only: bool = False
+) -> Iterator[Dict[str, Any]]:
+    """Stream deduplicated capture records from the shards in ``directory``.
+
+    Records with the same request, rendered prompt and raw output are
+    emitted once. Only a short digest per record is kept in memory.
+    """
+    seen = set()
+    for record in iter_shards(directory, SHARD_PREFIX):
+        if valid_only and (not record["parsed"] or record["violations"]):
+            continue
+        digest = hashlib.blake2b(
+            "\0".join(
+                [
+                    record["request_key"],
+                    record["prompt_hash"],
+                    record["raw_output"],
+                ]
+            ).encode(),
+            digest_size=16,
+        ).digest()
+        if digest in seen:
+            continue
+        seen.add(digest)
+        yield record
+
+
+# Create global service instance
+capture_service = CaptureService()
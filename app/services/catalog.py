@@ -0,0 +1,168 @@
+"""Exercise catalog with a nearest-neighbour index over machine names."""
+
+import hashlib
+import json
+import logging
+from pathlib import Path
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+
+from app.core.config import settings
+from app.schemas.catalog import CatalogMachine
+from app.schemas.catalog import MachineMatch
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CATALOG_PATH = Path(__file__).parent.parent / "data" / "exercise_catalog.json"
+
+# Free-text names seen in requests repeat a lot; remember their matches
+MATCH_CACHE_SIZE = 10000
+
+# Index entries searched for the best match of a different machine
+RUNNER_UP_CANDIDATES = 20
+
+
+class ExerciseCatalog:
+    """Map free-text machine names to canonical machines and exercises.
+
+    Every machine name, alias and exercise name in the catalog is embedded
+    with character n-gram TF-IDF, so misspellings and word-order changes
+    ("leg standing curl") still land on the right machine. The fitted index
+    can be persisted to ``EXERCISE_INDEX_PATH`` and is then loaded
+    memory-mapped instead of being rebuilt; it is rebuilt automatically
+    when the catalog file changes.
+    """
+
+    def __init__(self, path: Optional[str] = None, index_path: Optional[str] = None):
+        self.path = Path(path or settings.EXERCISE_CATALOG_PATH or DEFAULT_CATALOG_PATH)
+        index_path = index_path or settings.EXERCISE_INDEX_PATH
+        self.index_path = Path(index_path) if index_path else None
+        self.machines: Dict[str, CatalogMachine] = {}
+        self._index: Optional[Dict[str, Any]] = None
+        self._matches: Dict[str, MachineMatch] = {}
+
+    @property
+    def loaded(self) -> bool:
+        """Whether the catalog and its index are ready."""
+        return self._index is not None
+
+    def load(self) -> None:
+        """Load the catalog and its index (once)."""
+        if self.loaded:
+            return
+        raw = self.path.read_bytes()
+        digest = hashlib.sha256(raw).hexdigest()
+        self.machines = {
+            entry["machine"]: CatalogMachine(**entry) for entry in json.loads(raw)
+        }
+        self._index = self._load_index(digest) or self._build_index(digest)
+        logger.info(
+            f"Loaded exercise catalog with {len(self.machines)} machines and "
+            f"{len(self._index['labels'])} index entries"
+        )
+
+    def _load_index(self, digest: str) -> Optional[Dict[str, Any]]:
+        """Load a persisted index if it matches the catalog contents."""
+        if self.index_path is None or not self.index_path.exists():
+            return None
+        import joblib
+
+        index = joblib.load(self.index_path, mmap_mode="r")
+        if index.get("digest") != digest:
+            logger.info("Exercise index is stale, rebuilding")
+            return None
+        return index
+
+    def _build_index(self, digest: str) -> Dict[str, Any]:
+        """Fit the TF-IDF nearest-neighbour index over all catalog names."""
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.neighbors import NearestNeighbors
+
+        labels: List[str] = []
+        texts: List[str] = []
+        for machine in self.machines.values():
+            names = [machine.machine, *machine.aliases]
+            names += [exercise.name for exercise in machine.exercises]
+            labels += [machine.machine] * len(names)
+            texts += names
+
+        vectorizer = TfidfVectorizer(analyzer="char_wb", ngram_range=(2, 4))
+        matrix = vectorizer.fit_transform(texts)
+        neighbors = NearestNeighbors(n_neighbors=1, metric="cosine", algorithm="brute")
+        neighbors.fit(matrix)
+        index = {
+            "digest": digest,
+            "vectorizer": vectorizer,
+            "neighbors": neighbors,
+            "labels": labels,
+        }
+
+        if self.index_path is not None:
+            import joblib
+
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            joblib.dump(index, self.index_path)
+        return index
+
+    def resolve(self, names: List[str]) -> List[MachineMatch]:
+        """Match each free-text machine name to its canonical machine.
+
+        A name only resolves when its best match scores at least
+        ``CATALOG_MIN_SIMILARITY`` and beats the best entry of any other
+        machine by ``CATALOG_MIN_MARGIN``; otherwise it is kept as given.
+        """
+        self.load()
+        unseen = list(dict.fromkeys(n for n in names if n not in self._matches))
+        if unseen:
+            labels = self._index["labels"]
+            vectors = self._index["vectorizer"].transform(unseen)
+            distances, positions = self._index["neighbors"].kneighbors(
+                vectors, n_neighbors=min(RUNNER_UP_CANDIDATES, len(labels))
+            )
+            if len(self._matches) + len(unseen) > MATCH_CACHE_SIZE:
+                self._matches.clear()
+            for name, row_distances, row_positions in zip(unseen, distances, positions):
+                best = labels[row_positions[0]]
+                score = float(1.0 - row_distances[0])
+                runner_up = next(
+                    (
+                        float(1.0 - distance)
+                        for distance, position in zip(row_distances, row_positions)
+                        if labels[position] != best
+                    ),
+                    0.0,
+                )
+                machine = None
+                if (
+                    score >= settings.CATALOG_MIN_SIMILARITY
+                    and score - runner_up >= settings.CATALOG_MIN_MARGIN
+                ):
+                    machine = best
+                self._matches[name] = MachineMatch(
+                    query=name, machine=machine, score=score
+                )
+        return [self._matches[name] for name in names]
+
+    def shortlist(self, matches: List[MachineMatch], size: int) -> Dict[str, List[str]]:
+        """Return up to ``size`` exercise names for every resolved machine."""
+        shortlist: Dict[str, List[str]] = {}
+        for match in matches:
+            if match.machine and match.machine not in shortlist:
+                exercises = self.machines[match.machine].exercises[:size]
+                shortlist[match.machine] = [exercise.name for exercise in exercises]
+        return shortlist
+
+    @staticmethod
+    def format_shortlist(shortlist: Dict[str, List[str]]) -> str:
+        """Render a shortlist compactly for a prompt."""
+        return "; ".join(
+            f"{machine}: {', '.join(exercises)}"
+            for machine, exercises in shortlist.items()
+        )
+
+
+# Create global catalog instance
+exercise_catalog = ExerciseCatalog()
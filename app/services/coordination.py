@@ -0,0 +1,582 @@
+"""Coordination of worker processes sharing one Ollama backend."""
+
+import asyncio
+import errno
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any
+from typing import AsyncIterator
+from typing import Callable
+from typing import Dict
+from typing import Iterator
+from typing import Optional
+from typing import Tuple
+
+from prometheus_client import Counter
+from prometheus_client import Histogram
+
+from app.core.config import settings
+from app.core.deadline import Deadline
+
+
+logger = logging.getLogger(__name__)
+
+# Cache writes between two sweeps of expired and surplus local cache files
+PRUNE_EVERY = 100
+MAX_POLL_INTERVAL = 0.5
+
+SLOT_WAIT = Histogram(
+    "train_ai_coordination_slot_wait_seconds",
+    "Time spent waiting for a global upstream slot",
+)
+SLOT_ATTEMPTS = Counter(
+    "train_ai_coordination_slot_attempts_total",
+    "Attempts to take a global upstream slot",
+    ["result"],
+)
+
+
+def may_start(running: Dict[str, int], model: str, hot: bool, capacity: int) -> bool:
+    """Whether a request for ``model`` may take a global slot.
+
+    The cross-worker version of ``ModelScheduler``'s rule: a model that is
+    neither resident nor running anywhere only starts once no request for
+    another model is in flight on any worker, so loading it cannot evict a
+    model mid-request.
+    """
+    if sum(running.values()) >= capacity:
+        return False
+    return hot or running.get(model, 0) > 0 or not running
+
+
+class Coordinator:
+    """Global in-flight limit, result cache and counters for the workers.
+
+    This base implementation only coordinates within one process and is
+    used when ``COORDINATION_BACKEND`` is ``process``. Subclasses share the
+    same state between every worker on a host (``local``) or across hosts
+    (``redis``), so the concurrency limit applies to the Ollama backend as a
+    whole, a prompt or plan fetched by one worker is reused by the others,
+    and counters add up over all workers.
+
+    Slots are model-aware (see ``may_start``). A request that has waited
+    ``SCHEDULER_MAX_WAIT`` seconds for a global slot is treated as hot, so a
+    cold model cannot be starved by other workers' traffic.
+
+    Counter increments are buffered in memory and flushed whenever a slot
+    is released and when stats are read.
+    """
+
+    backend = "process"
+
+    def __init__(self, capacity: int, cache_size: int = 10000):
+        self.capacity = capacity
+        self.cache_size = cache_size
+        self.in_flight = 0
+        self._running: Dict[str, int] = {}
+        self._pending: Dict[str, float] = {}
+        self._cache: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._counters: Dict[str, float] = {}
+
+    @property
+    def saturated(self) -> bool:
+        """Whether every slot was in use when last observed."""
+        return self.in_flight >= self.capacity
+
+    @asynccontextmanager
+    async def slot(
+        self, model: str, resident: bool = False, deadline: Optional[Deadline] = None
+    ) -> AsyncIterator[None]:
+        """Hold one of the ``capacity`` global upstream slots for ``model``.
+
+        Args:
+            model: Normalized model name.
+            resident: Whether Ollama reported the model as loaded.
+            deadline: Deadline to give up waiting at.
+        """
+        token = await self._wait_for_slot(model, resident, deadline)
+        try:
+            yield
+        finally:
+            await asyncio.shield(self._release_and_flush(token))
+
+    async def _wait_for_slot(
+        self, model: str, resident: bool, deadline: Optional[Deadline]
+    ) -> str:
+        """Poll for a slot, backing off from ``COORDINATION_POLL_INTERVAL``."""
+        started = time.monotonic()
+        delay = settings.COORDINATION_POLL_INTERVAL
+        while True:
+            waited = time.monotonic() - started
+            hot = resident or waited >= settings.SCHEDULER_MAX_WAIT
+            attempt = asyncio.ensure_future(self._try_acquire(model, hot))
+            try:
+                token = await asyncio.shield(attempt)
+            except asyncio.CancelledError:
+                # The attempt may still win a slot; hand it back when it does
+                attempt.add_done_callback(self._release_abandoned)
+                raise
+            if token is not None:
+                SLOT_ATTEMPTS.labels(result="granted").inc()
+                SLOT_WAIT.observe(time.monotonic() - started)
+                return token
+            SLOT_ATTEMPTS.labels(result="busy").inc()
+            if deadline is not None and deadline.remaining() <= delay:
+                deadline.reject("queue", "No global upstream slot became free")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_POLL_INTERVAL)
+
+    def _release_abandoned(self, attempt: "asyncio.Future[Optional[str]]") -> None:
+        if attempt.cancelled() or attempt.exception() is not None:
+            return
+        if attempt.result() is not None:
+            asyncio.ensure_future(self._release_and_flush(attempt.result()))
+
+    async def _release_and_flush(self, token: str) -> None:
+        try:
+            await self._release(token)
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Failed to release global upstream slot: {e}")
+
+    async def _try_acquire(self, model: str, hot: bool) -> Optional[str]:
+        """Take a slot if ``may_start`` allows, returning a token to release it."""
+        if not may_start(self._running, model, hot, self.capacity):
+            return None
+        self._running[model] = self._running.get(model, 0) + 1
+        self.in_flight += 1
+        return model
+
+    async def _release(self, token: str) -> None:
+        self._running[token] -= 1
+        if not self._running[token]:
+            del self._running[token]
+        self.in_flight -= 1
+
+    async def cache_get(self, key: str) -> Optional[str]:
+        """Cached value for ``key`` unless it is missing or expired."""
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.time():
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return value
+
+    async def cache_set(self, key: str, value: str, ttl: float) -> None:
+        """Cache ``value`` under ``key`` for ``ttl`` seconds."""
+        self._cache[key] = (time.time() + ttl, value)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def cache_add(self, key: str, value: str, ttl: float) -> bool:
+        """Cache ``value`` only if ``key`` is not cached yet.
+
+        Returns:
+            Whether the value was stored; use it to claim work.
+        """
+        if await self.cache_get(key) is not None:
+            return False
+        await self.cache_set(key, value, ttl)
+        return True
+
+    async def cache_delete(self, key: str) -> None:
+        """Remove ``key`` from the cache."""
+        self._cache.pop(key, None)
+
+    def incr(self, name: str, amount: float = 1) -> None:
+        """Add ``amount`` to the shared counter ``name``."""
+        self._pending[name] = self._pending.get(name, 0) + amount
+
+    def _take_pending(self) -> Dict[str, float]:
+        pending, self._pending = self._pending, {}
+        return pending
+
+    async def flush(self) -> None:
+        """Publish buffered counter increments."""
+        for name, amount in self._take_pending().items():
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    async def stats(self) -> Dict[str, Any]:
+        """Global in-flight requests and counters summed over all workers."""
+        await self.flush()
+        return {
+            "backend": self.backend,
+            "capacity": self.capacity,
+            "in_flight": self.in_flight,
+            "counters": dict(self._counters),
+        }
+
+    async def close(self) -> None:
+        """Flush counters and release connections."""
+        await self.flush()
+
+
+def default_directory() -> Path:
+    """Shared-memory directory for the local backend, where available."""
+    base = Path("/dev/shm")
+    if not base.is_dir():
+        base = Path(tempfile.gettempdir())
+    return base / f"{settings.COORDINATION_NAMESPACE}-{os.getuid()}"
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except OSError as e:
+        return e.errno == errno.EPERM
+    return True
+
+
+class LocalCoordinator(Coordinator):
+    """Coordinate the workers on one host through a shared directory.
+
+    Slot holders (per process and model) and counters live in one JSON state
+    file, updated under an exclusive ``flock``; slots held by processes that
+    have exited are reclaimed on the next update. Cache entries are separate
+    files written with an atomic rename. The default directory is in
+    ``/dev/shm``, so all of this stays in shared memory. File operations run
+    in a thread so they never block the event loop.
+    """
+
+    backend = "local"
+
+    def __init__(self, capacity: int, directory: Path, cache_size: int = 10000):
+        super().__init__(capacity, cache_size)
+        self.directory = directory
+        self._cache_dir = directory / "cache"
+        self._cache_dir.mkdir(parents=True, exist_ok=True)
+        self._state_path = directory / "state.json"
+        self._lock_path = directory / "lock"
+        self._writes = 0
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        import fcntl
+
+        with open(self._lock_path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _update(
+        self, change: Callable[[Dict[str, Any]], Any], pending: Dict[str, float]
+    ) -> Any:
+        """Apply ``change`` to the shared state and add ``pending`` counters."""
+        with self._locked():
+            raw = None
+            try:
+                raw = self._state_path.read_text()
+                state = json.loads(raw)
+            except FileNotFoundError:
+                state = {}
+            except ValueError:
+                logger.warning(
+                    f"Resetting unreadable coordination state in {self.directory}"
+                )
+                state = {}
+            slots = state.setdefault("slots", {})
+            counters = state.setdefault("counters", {})
+
+            # Entries that are not per-model dicts come from older versions
+            for pid in [
+                pid
+                for pid, models in slots.items()
+                if not isinstance(models, dict) or not _alive(int(pid))
+            ]:
+                del slots[pid]
+            for name, amount in pending.items():
+                counters[name] = counters.get(name, 0) + amount
+            result = change(state)
+
+            self.in_flight = sum(sum(models.values()) for models in slots.values())
+            updated = json.dumps(state)
+            # A poll that found no free slot leaves the state as it was
+            if updated != raw:
+                _write_atomic(self._state_path, updated)
+        return result
+
+    async def _try_acquire(self, model: str, hot: bool) -> Optional[str]:
+        def take(state: Dict[str, Any]) -> Optional[str]:
+            running: Dict[str, int] = {}
+            for models in state["slots"].values():
+                for name, count in models.items():
+                    running[name] = running.get(name, 0) + count
+            if not may_start(running, model, hot, self.capacity):
+                return None
+            pid = str(os.getpid())
+            models = state["slots"].setdefault(pid, {})
+            models[model] = models.get(model, 0) + 1
+            return f"{pid} {model}"
+
+        return await asyncio.to_thread(self._update, take, self._take_pending())
+
+    async def _release(self, token: str) -> None:
+        pid, model = token.split(" ", 1)
+
+        def give_back(state: Dict[str, Any]) -> None:
+            models = state["slots"].get(pid, {})
+            if models.get(model, 0) > 1:
+                models[model] -= 1
+            else:
+                models.pop(model, None)
+            if not models:
+                state["slots"].pop(pid, None)
+
+        await asyncio.to_thread(self._update, give_back, self._take_pending())
+
+    def _entry_path(self, key: str) -> Path:
+        return self._cache_dir / f"{hashlib.sha256(key.encode()).hexdigest()}.json"
+
+    def _read_entry(self, key: str) -> Optional[str]:
+        path = self._entry_path(key)
+        try:
+            entry = json.loads(path.read_text())
+        except (FileNotFoundError, ValueError):
+            return None
+        if entry["expires_at"] <= time.time():
+            path.unlink(missing_ok=True)
+            return None
+        return entry["value"]
+
+    def _write_entry(self, key: str, value: str, ttl: float) -> None:
+        entry = {"expires_at": time.time() + ttl, "value": value}
+        _write_atomic(self._entry_path(key), json.dumps(entry))
+        self._writes += 1
+        if self._writes % PRUNE_EVERY == 0:
+            self._prune()
+
+    def _prune(self) -> None:
+        """Drop expired entries, then the oldest ones beyond ``cache_size``."""
+        now = time.time()
+        entries = []
+        for path in self._cache_dir.glob("*.json"):
+            try:
+                entry = json.loads(path.read_text())
+                if entry["expires_at"] <= now:
+                    path.unlink()
+                else:
+                    entries.append((path.stat().st_mtime, path))
+            except (FileNotFoundError, ValueError):
+                continue
+        entries.sort()
+        for _, path in entries[: max(0, len(entries) - self.cache_size)]:
+            path.unlink(missing_ok=True)
+
+    async def cache_get(self, key: str) -> Optional[str]:
+        return await asyncio.to_thread(self._read_entry, key)
+
+    async def cache_set(self, key: str, value: str, ttl: float) -> None:
+        await asyncio.to_thread(self._write_entry, key, value, ttl)
+
+    async def cache_add(self, key: str, value: str, ttl: float) -> bool:
+        def add() -> bool:
+            with self._locked():
+                if self._read_entry(key) is not None:
+                    return False
+                self._write_entry(key, value, ttl)
+                return True
+
+        return await asyncio.to_thread(add)
+
+    async def cache_delete(self, key: str) -> None:
+        await asyncio.to_thread(self._entry_path(key).unlink, missing_ok=True)
+
+    async def flush(self) -> None:
+        if self._pending:
+            await asyncio.to_thread(
+                self._update, lambda state: None, self._take_pending()
+            )
+
+    async def stats(self) -> Dict[str, Any]:
+        counters = await asyncio.to_thread(
+            self._update, lambda state: dict(state["counters"]), self._take_pending()
+        )
+        return {
+            "backend": self.backend,
+            "capacity": self.capacity,
+            "in_flight": self.in_flight,
+            "counters": counters,
+        }
+
+
+def _write_atomic(path: Path, text: str) -> None:
+    temporary = path.with_name(f".{path.name}.{os.getpid()}.{uuid.uuid4().hex}")
+    temporary.write_text(text)
+    os.replace(temporary, path)
+
+
+# Frees expired slots, then takes one as ``may_start`` would: fewer than
+# ARGV[2] held, and the model hot (ARGV[5]), already running or alone
+ACQUIRE_SCRIPT = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+local members = redis.call('ZRANGE', KEYS[1], 0, -1)
+local held = #members
+if held >= tonumber(ARGV[2]) then
+    return {0, held}
+end
+if ARGV[5] ~= '1' and held > 0 then
+    local prefix = ARGV[6] .. ' '
+    local running = false
+    for _, member in ipairs(members) do
+        if string.sub(member, 1, #prefix) == prefix then
+            running = true
+            break
+        end
+    end
+    if not running then
+        return {0, held}
+    end
+end
+redis.call('ZADD', KEYS[1], ARGV[3], ARGV[4])
+return {1, held + 1}
+"""
+
+
+class RedisCoordinator(Coordinator):
+    """Coordinate workers on any number of hosts through Redis.
+
+    Slots are leases in a sorted set, with the model as the member prefix,
+    so slots held by a crashed worker
+    expire after ``COORDINATION_SLOT_LEASE`` seconds. Cache entries are
+    plain keys with a TTL and counters are fields of one hash. The
+    connection is opened on first use, after workers have been forked.
+    """
+
+    backend = "redis"
+
+    def __init__(
+        self,
+        capacity: int,
+        url: str,
+        namespace: str,
+        lease: float,
+        cache_size: int = 10000,
+    ):
+        super().__init__(capacity, cache_size)
+        self.url = url
+        self.namespace = namespace
+        self.lease = lease
+        self._client = None
+        self._acquire_script = None
+
+    def _key(self, *parts: str) -> str:
+        return ":".join((self.namespace,) + parts)
+
+    @property
+    def client(self) -> Any:
+        """Redis client, created on first use."""
+        if self._client is None:
+            import redis.asyncio as redis
+
+            self._client = redis.from_url(self.url, decode_responses=True)
+        return self._client
+
+    async def _try_acquire(self, model: str, hot: bool) -> Optional[str]:
+        if self._acquire_script is None:
+            self._acquire_script = self.client.register_script(ACQUIRE_SCRIPT)
+        token = f"{model} {uuid.uuid4().hex}"
+        now = time.time()
+        acquired, held = await self._acquire_script(
+            keys=[self._key("slots")],
+            args=[now, self.capacity, now + self.lease, token, int(hot), model],
+        )
+        self.in_flight = held
+        return token if acquired else None
+
+    async def _release(self, token: str) -> None:
+        async with self.client.pipeline() as pipe:
+            pipe.zrem(self._key("slots"), token)
+            pipe.zcard(self._key("slots"))
+            _, self.in_flight = await pipe.execute()
+
+    async def cache_get(self, key: str) -> Optional[str]:
+        return await self.client.get(self._key("cache", key))
+
+    async def cache_set(self, key: str, value: str, ttl: float) -> None:
+        await self.client.set(self._key("cache", key), value, px=int(ttl * 1000))
+
+    async def cache_add(self, key: str, value: str, ttl: float) -> bool:
+        return bool(
+            await self.client.set(
+                self._key("cache", key), value, px=int(ttl * 1000), nx=True
+            )
+        )
+
+    async def cache_delete(self, key: str) -> None:
+        await self.client.delete(self._key("cache", key))
+
+    async def flush(self) -> None:
+        pending = self._take_pending()
+        if not pending:
+            return
+        async with self.client.pipeline(transaction=False) as pipe:
+            for name, amount in pending.items():
+                pipe.hincrbyfloat(self._key("counters"), name, amount)
+            await pipe.execute()
+
+    async def stats(self) -> Dict[str, Any]:
+        await self.flush()
+        self.in_flight = await self.client.zcount(
+            self._key("slots"), time.time(), "+inf"
+        )
+        counters = await self.client.hgetall(self._key("counters"))
+        return {
+            "backend": self.backend,
+            "capacity": self.capacity,
+            "in_flight": self.in_flight,
+            "counters": {name: float(value) for name, value in counters.items()},
+        }
+
+    async def close(self) -> None:
+        if self._client is None:
+            return
+        await self.flush()
+        await self._client.aclose()
+        self._client = None
+        self._acquire_script = None
+
+
+def create_coordinator() -> Coordinator:
+    """Coordinator for the configured ``COORDINATION_BACKEND``."""
+    backend = settings.COORDINATION_BACKEND.lower()
+    capacity = settings.OLLAMA_MAX_CONCURRENCY
+    cache_size = settings.COORDINATION_CACHE_SIZE
+    if backend == "local":
+        directory = (
+            Path(settings.COORDINATION_DIR)
+            if settings.COORDINATION_DIR
+            else default_directory()
+        )
+        return LocalCoordinator(capacity, directory, cache_size)
+    if backend == "redis":
+        return RedisCoordinator(
+            capacity,
+            settings.COORDINATION_REDIS_URL,
+            settings.COORDINATION_NAMESPACE,
+            settings.COORDINATION_SLOT_LEASE,
+            cache_size,
+        )
+    if backend != "process":
+        raise ValueError(
+            f"Unknown COORDINATION_BACKEND: {settings.COORDINATION_BACKEND}"
+        )
+    return Coordinator(capacity, cache_size)
+
+
+# Create global coordinator instance
+coordinator = create_coordinator()
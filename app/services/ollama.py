@@ -1,13 +1,25 @@
 """Ollama service for handling AI model interactions."""
 
-import aiohttp
 import asyncio
-from typing import Dict, Any, Optional, List
 import json
 import logging
+import time
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+
+import aiohttp
 
 from app.core.config import settings
-from app.schemas.ollama import ChatRequest, ChatResponse, ModelInfo
+from app.core.deadline import Deadline
+from app.schemas.ollama import ChatRequest
+from app.schemas.ollama import ChatResponse
+from app.schemas.ollama import ModelInfo
+from app.services.coordination import coordinator
+from app.services.scheduler import ModelScheduler
+from app.services.scheduler import normalize_model
+
 
 logger = logging.getLogger(__name__)
 
@@ -19,28 +31,73 @@ class OllamaService:
         self.base_url = settings.OLLAMA_BASE_URL
         self.timeout = settings.OLLAMA_TIMEOUT
         self.default_model = settings.OLLAMA_DEFAULT_MODEL
+        self.max_retries = settings.OLLAMA_MAX_RETRIES
+        self.scheduler = ModelScheduler(
+            capacity=settings.OLLAMA_MAX_CONCURRENCY,
+            max_batch=settings.SCHEDULER_MAX_BATCH,
+            max_wait=settings.SCHEDULER_MAX_WAIT,
+            fetch_resident=self.list_running_models,
+            resident_ttl=settings.SCHEDULER_RESIDENT_TTL,
+        )
+
+    @property
+    def saturated(self) -> bool:
+        """Whether every upstream slot of this worker or all workers is in use."""
+        return self.scheduler.saturated or coordinator.saturated
 
     async def _make_request(
-        self, endpoint: str, data: Dict[str, Any]
+        self,
+        endpoint: str,
+        data: Dict[str, Any],
+        deadline: Optional[Deadline] = None,
+        retries: int = 0,
     ) -> Dict[str, Any]:
-        """Make a request to Ollama API."""
+        """Make a request to Ollama API.
+
+        Connection errors, timeouts and 5xx responses are retried up to
+        ``retries`` times. All attempts together take at most
+        ``OLLAMA_TIMEOUT`` seconds; with a deadline, every attempt's timeout
+        is also capped by the remaining budget and no retry starts once it is
+        spent.
+        """
         url = f"{self.base_url}/{endpoint}"
+        give_up = time.monotonic() + self.timeout
 
-        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        attempt = 0
+        while True:
+            total = give_up - time.monotonic()
+            if deadline is not None:
+                total = min(total, deadline.observe("upstream"))
+            timeout = aiohttp.ClientTimeout(total=total)
 
-        async with aiohttp.ClientSession(timeout=timeout) as session:
             try:
-                async with session.post(url, json=data) as response:
-                    if response.status == 200:
-                        return await response.json()
-                    else:
+                async with aiohttp.ClientSession(timeout=timeout) as session:
+                    async with session.post(url, json=data) as response:
+                        if response.status == 200:
+                            return await response.json()
                         error_text = await response.text()
-                        raise Exception(
+                        error = Exception(
                             f"Ollama API error: {response.status} - {error_text}"
                         )
+                        if response.status < 500:
+                            raise error
             except aiohttp.ClientError as e:
                 logger.error(f"Failed to connect to Ollama: {e}")
-                raise Exception(f"Failed to connect to Ollama: {e}")
+                error = Exception(f"Failed to connect to Ollama: {e}")
+            except asyncio.TimeoutError:
+                logger.error(f"Ollama request timed out after {total:.1f}s")
+                if deadline is not None and deadline.remaining() <= 0:
+                    deadline.reject("upstream")
+                error = Exception(f"Ollama request timed out after {total:.1f}s")
+
+            attempt += 1
+            backoff = min(0.1 * 2**attempt, 2.0)
+            if attempt > retries or time.monotonic() + backoff >= give_up:
+                raise error
+            if deadline is not None and deadline.remaining() <= 0:
+                deadline.reject("retry")
+            logger.warning(f"Retrying Ollama request ({attempt}/{retries})")
+            await asyncio.sleep(backoff)
 
     async def chat_with_system(
         self,
@@ -49,13 +106,15 @@ class OllamaService:
         temperature: float = None,
         max_tokens: int = None,
         format_schema: dict = None,
+        deadline: Optional[Deadline] = None,
     ) -> ChatResponse:
         """Send structured messages (system + user) to Ollama using chat API."""
         model = model or self.default_model
 
         data = {
             "model": model,
-            "messages": messages,  # [{"role": "system", "content": "..."}, {"role": "user", "content": "..."}]
+            # [{"role": "system", "content": "..."}, {"role": "user", ...}]
+            "messages": messages,
             "stream": False,
         }
 
@@ -71,13 +130,32 @@ class OllamaService:
             if max_tokens is not None:
                 data["options"]["num_predict"] = max_tokens
 
-        response_data = await self._make_request("api/chat", data)
-
-        return ChatResponse(
+        await self.scheduler.acquire(model, deadline)
+        try:
+            # The global slot applies the scheduler's model rule across workers
+            name = normalize_model(model)
+            resident = name in self.scheduler.resident
+            async with coordinator.slot(name, resident, deadline):
+                coordinator.incr("upstream_requests")
+                try:
+                    response_data = await self._make_request(
+                        "api/chat", data, deadline, self.max_retries
+                    )
+                except Exception:
+                    coordinator.incr("upstream_errors")
+                    raise
+                prompt_tokens = response_data.get("prompt_eval_count") or 0
+                coordinator.incr("prompt_tokens", prompt_tokens)
+                coordinator.incr("output_tokens", response_data.get("eval_count") or 0)
+        finally:
+            self.scheduler.release(model)
+
+        response = ChatResponse(
             response=response_data.get("message", {}).get("content", ""),
             model=response_data.get("model", model),
             created_at=response_data.get("created_at", ""),
             done=response_data.get("done", True),
+            done_reason=response_data.get("done_reason"),
             total_duration=response_data.get("total_duration"),
             load_duration=response_data.get("load_duration"),
             prompt_eval_count=response_data.get("prompt_eval_count"),
@@ -85,6 +163,22 @@ class OllamaService:
             eval_count=response_data.get("eval_count"),
             eval_duration=response_data.get("eval_duration"),
         )
+        self.scheduler.observe(model, response)
+        return response
+
+    async def list_running_models(self) -> List[str]:
+        """List the models Ollama currently holds in memory."""
+        url = f"{self.base_url}/api/ps"
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            async with session.get(url) as response:
+                if response.status != 200:
+                    error_text = await response.text()
+                    raise Exception(
+                        f"Ollama API error: {response.status} - {error_text}"
+                    )
+                response_data = await response.json()
+        return [m.get("name", "") for m in response_data.get("models", [])]
 
     async def list_models(self) -> List[ModelInfo]:
         """List available models."""
@@ -0,0 +1,63 @@
+"""Per-request choice between rule-based and LLM plan generation."""
+
+import logging
+from enum import Enum
+
+from prometheus_client import Counter
+
+from app.core.config import settings
+from app.schemas.ollama import ChatRequest
+from app.services.ollama import ollama_service
+from app.services.rules import rule_based_planner
+
+
+logger = logging.getLogger(__name__)
+
+PLAN_ROUTES = Counter(
+    "train_ai_plan_routes_total",
+    "Plan requests per generation route",
+    ["route"],
+)
+
+
+class Route(str, Enum):
+    """How a plan is generated."""
+
+    RULES = "rules"
+    LLM = "llm"
+    RULES_THEN_LLM = "rules_then_llm"
+
+
+class RoutingPolicy:
+    """Decide per request which generation route to use.
+
+    ``PLAN_ROUTING`` forces a route, or is ``auto``: requests that name a
+    model go to the LLM, standard profiles get the rule-based plan with an
+    LLM refinement in the background, and while every upstream slot is busy
+    they get the rule-based plan only. Profiles the rules cannot serve
+    always go to the LLM.
+    """
+
+    def route(self, request: ChatRequest) -> Route:
+        """Return the route for ``request``."""
+        route = self._choose(request)
+        PLAN_ROUTES.labels(route=route.value).inc()
+        logger.debug(f"Routing plan request via {route.value}")
+        return route
+
+    def _choose(self, request: ChatRequest) -> Route:
+        if settings.PLAN_ROUTING == Route.LLM.value:
+            return Route.LLM
+        if not rule_based_planner.supports(request):
+            return Route.LLM
+        if settings.PLAN_ROUTING != "auto":
+            return Route(settings.PLAN_ROUTING)
+        if request.model:
+            return Route.LLM
+        if ollama_service.saturated:
+            return Route.RULES
+        return Route.RULES_THEN_LLM
+
+
+# Create global policy instance
+routing_policy = RoutingPolicy()
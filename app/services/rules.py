@@ -0,0 +1,171 @@
+"""Deterministic, LLM-free workout plan generation."""
+
+import logging
+from itertools import zip_longest
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from app.schemas.ollama import ChatRequest
+from app.schemas.ollama import Exercise
+from app.schemas.ollama import UserProfile
+from app.schemas.ollama import WorkoutDay
+from app.schemas.ollama import WorkoutPlan
+from app.services.catalog import exercise_catalog
+
+
+logger = logging.getLogger(__name__)
+
+# Training days for each number of sessions per week
+WEEK_LAYOUTS = {
+    1: ["Monday"],
+    2: ["Monday", "Thursday"],
+    3: ["Monday", "Wednesday", "Friday"],
+    4: ["Monday", "Tuesday", "Thursday", "Friday"],
+    5: ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"],
+    6: ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"],
+    7: [
+        "Monday",
+        "Tuesday",
+        "Wednesday",
+        "Thursday",
+        "Friday",
+        "Saturday",
+        "Sunday",
+    ],
+}
+
+# Physical condition keywords mapped to an intensity level
+CONDITION_INTENSITY = {
+    "Low": ["sedentary", "overweight", "obese", "unfit", "beginner", "poor"],
+    "Medium": ["average", "moderate", "normal", "intermediate", "active"],
+    "High": ["athletic", "athlete", "advanced", "fit", "excellent", "strong"],
+}
+
+# Sets, reps and minutes of one strength exercise at each intensity
+STRENGTH_DOSE = {"Low": (2, 12, 5), "Medium": (3, 10, 7), "High": (4, 8, 9)}
+
+WARM_UP_MINUTES = 10
+MAX_CARDIO_BLOCK = 30
+
+
+class RuleBasedPlanner:
+    """Build workout plans from request fields and the exercise catalog.
+
+    Strength exercises for the available machines are interleaved by muscle
+    group and dealt out across the week; each day opens with a cardio
+    warm-up and closes with a cardio block when a cardio machine is
+    available and time allows. Every day fits within ``workout_time``.
+    """
+
+    def intensity(self, physical_condition: str) -> Optional[str]:
+        """Intensity for a physical condition, or None when it is unknown."""
+        condition = physical_condition.casefold()
+        for intensity, keywords in CONDITION_INTENSITY.items():
+            if any(keyword in condition for keyword in keywords):
+                return intensity
+        return None
+
+    def supports(self, request: ChatRequest) -> bool:
+        """Whether the request is a standard profile the rules can serve."""
+        if self.intensity(request.physical_condition) is None:
+            return False
+        matches = exercise_catalog.resolve(request.available_machines)
+        return bool(matches) and all(match.machine for match in matches)
+
+    def _exercise_pool(
+        self, request: ChatRequest
+    ) -> Tuple[List[Tuple[str, str]], List[Tuple[str, str]]]:
+        """Return (machine, exercise) pairs for strength work and for cardio."""
+        by_group: Dict[str, List[Tuple[str, str]]] = {}
+        for match in exercise_catalog.resolve(request.available_machines):
+            if not match.machine:
+                continue
+            for exercise in exercise_catalog.machines[match.machine].exercises:
+                pair = (match.machine, exercise.name)
+                group = by_group.setdefault(exercise.group, [])
+                if pair not in group:
+                    group.append(pair)
+
+        cardio = by_group.pop("cardio", [])
+        strength = [
+            pair
+            for round_ in zip_longest(*by_group.values())
+            for pair in round_
+            if pair is not None
+        ]
+        return strength, cardio
+
+    def build(self, request: ChatRequest) -> WorkoutPlan:
+        """Build a plan for ``request``.
+
+        Raises:
+            ValueError: If none of the available machines are in the catalog.
+        """
+        strength, cardio = self._exercise_pool(request)
+        if not strength and not cardio:
+            raise ValueError("No catalog exercises for the available machines")
+
+        intensity = self.intensity(request.physical_condition) or "Medium"
+        sets, reps, minutes = STRENGTH_DOSE[intensity]
+        sessions = min(max(request.sessions_per_week, 1), 7)
+
+        next_strength = 0
+        next_cardio = 0
+        weekly_routine = []
+        for day in WEEK_LAYOUTS[sessions]:
+            remaining = request.workout_time
+            exercises: List[Exercise] = []
+
+            def add(machine: str, name: str, s: int, r: int, duration: int) -> None:
+                nonlocal remaining
+                exercises.append(
+                    Exercise(
+                        machine=machine,
+                        exercise_name=name,
+                        sets=s,
+                        reps=r,
+                        duration_minutes=duration,
+                        intensity=intensity,
+                    )
+                )
+                remaining -= duration
+
+            if cardio and strength and remaining >= WARM_UP_MINUTES + minutes:
+                machine, name = cardio[next_cardio % len(cardio)]
+                add(machine, name, 1, 1, WARM_UP_MINUTES)
+                next_cardio += 1
+
+            if strength:
+                closing = WARM_UP_MINUTES if cardio else 0
+                for _ in range(len(strength)):
+                    if remaining - closing < minutes:
+                        break
+                    machine, name = strength[next_strength % len(strength)]
+                    add(machine, name, sets, reps, minutes)
+                    next_strength += 1
+
+            while cardio and remaining >= WARM_UP_MINUTES:
+                machine, name = cardio[next_cardio % len(cardio)]
+                add(machine, name, 1, 1, min(remaining, MAX_CARDIO_BLOCK))
+                next_cardio += 1
+
+            if not exercises:
+                # Sessions shorter than a single exercise get one short block
+                machine, name = (strength or cardio)[0]
+                add(machine, name, 1, reps, max(request.workout_time, 1))
+
+            weekly_routine.append(WorkoutDay(day=day, exercises=exercises))
+
+        user_profile = UserProfile.from_request(request)
+        return WorkoutPlan(user_profile=user_profile, weekly_routine=weekly_routine)
+
+    def build_day(self, request: ChatRequest, position: int, day: str) -> WorkoutDay:
+        """Build the session at ``position`` of the week, named ``day``."""
+        routine = self.build(request).weekly_routine
+        return routine[position % len(routine)].model_copy(update={"day": day})
+
+
+# Create global planner instance
+rule_based_planner = RuleBasedPlanner()
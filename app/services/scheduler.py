@@ -0,0 +1,245 @@
+"""Model-aware scheduling of upstream Ollama requests."""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from collections import deque
+from typing import Awaitable
+from typing import Callable
+from typing import Deque
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Set
+from typing import Tuple
+
+from prometheus_client import Counter
+from prometheus_client import Gauge
+
+from app.core.deadline import Deadline
+from app.core.deadline import DeadlineExceeded
+from app.schemas.ollama import ChatResponse
+
+
+logger = logging.getLogger(__name__)
+
+# A response whose load took longer than this means Ollama (re)loaded the model
+LOAD_THRESHOLD_SECONDS = 0.25
+
+MODEL_LOADS = Counter(
+    "train_ai_model_loads_total",
+    "Upstream responses that had to load their model",
+    ["model"],
+)
+MODEL_SWITCHES = Counter(
+    "train_ai_scheduler_switches_total",
+    "Dispatches to a model that was not resident",
+)
+REORDERED_REQUESTS = Counter(
+    "train_ai_scheduler_reordered_total",
+    "Dispatches that overtook an older request for a non-resident model",
+)
+LOAD_SECONDS_AVOIDED = Counter(
+    "train_ai_scheduler_load_seconds_avoided_total",
+    "Estimated model load time saved by reordering requests",
+)
+QUEUED_REQUESTS = Gauge(
+    "train_ai_scheduler_queued_requests",
+    "Requests waiting for an upstream slot",
+    ["model"],
+)
+
+Waiter = Tuple["asyncio.Future[None]", float]
+
+
+def normalize_model(name: str) -> str:
+    """Model name as Ollama reports it, with an explicit tag."""
+    return name if ":" in name else f"{name}:latest"
+
+
+class ModelScheduler:
+    """Hand out upstream slots so that Ollama swaps models as rarely as possible.
+
+    Waiting requests are grouped per model. Requests for models that are
+    resident (per ``api/ps``) or already running are dispatched first, and
+    the scheduler keeps draining the current model's queue before moving
+    on. A model that is not resident only starts once in-flight requests
+    for other models have finished, so loading it cannot evict a model
+    mid-request. Two fairness limits prevent starvation: after
+    ``max_batch`` consecutive dispatches of one model while others wait
+    the scheduler moves on, and a request that has waited ``max_wait``
+    seconds is served next regardless of its model.
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        max_batch: int,
+        max_wait: float,
+        fetch_resident: Optional[Callable[[], Awaitable[List[str]]]] = None,
+        resident_ttl: float = 5.0,
+    ):
+        self.capacity = capacity
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.resident: Set[str] = set()
+        self.current: Optional[str] = None
+        self._fetch_resident = fetch_resident
+        self._resident_ttl = resident_ttl
+        self._refreshed_at: Optional[float] = None
+        self._queues: "OrderedDict[str, Deque[Waiter]]" = OrderedDict()
+        self._running: Dict[str, int] = {}
+        self._streak = 0
+        self._load_seconds: Dict[str, float] = {}
+
+    @property
+    def in_flight(self) -> int:
+        """Number of slots in use."""
+        return sum(self._running.values())
+
+    @property
+    def saturated(self) -> bool:
+        """Whether every slot is in use."""
+        return self.in_flight >= self.capacity
+
+    async def acquire(self, model: str, deadline: Optional[Deadline] = None) -> None:
+        """Wait for a slot to run a request for ``model``."""
+        model = normalize_model(model)
+        await self._refresh_resident(deadline)
+        # Fail before queueing, so an expired request can never be granted a slot
+        timeout = None if deadline is None else deadline.observe("queue")
+
+        waiter: "asyncio.Future[None]" = asyncio.get_running_loop().create_future()
+        entry = (waiter, time.monotonic())
+        self._queues.setdefault(model, deque()).append(entry)
+        QUEUED_REQUESTS.labels(model=model).inc()
+        self._dispatch()
+
+        try:
+            if timeout is None:
+                await asyncio.shield(waiter)
+            else:
+                await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError, DeadlineExceeded) as e:
+            if waiter.done():
+                # The slot was granted as we gave up on it
+                self.release(model)
+            else:
+                waiter.cancel()
+                self._queues[model].remove(entry)
+                QUEUED_REQUESTS.labels(model=model).dec()
+                if not self._queues[model]:
+                    del self._queues[model]
+                self._dispatch()
+            if isinstance(e, asyncio.TimeoutError) and deadline is not None:
+                deadline.reject("queue")
+            raise
+
+    def release(self, model: str) -> None:
+        """Return the slot held by a request for ``model``."""
+        model = normalize_model(model)
+        self._running[model] -= 1
+        if not self._running[model]:
+            del self._running[model]
+        self._dispatch()
+
+    def observe(self, model: str, response: ChatResponse) -> None:
+        """Learn from a response whether Ollama had to load the model."""
+        model = normalize_model(model)
+        seconds = (response.load_duration or 0) / 1e9
+        if seconds > LOAD_THRESHOLD_SECONDS:
+            MODEL_LOADS.labels(model=model).inc()
+            previous = self._load_seconds.get(model, seconds)
+            self._load_seconds[model] = previous + 0.2 * (seconds - previous)
+            # Loading may have evicted other models; re-check api/ps soon
+            self.resident = {model}
+            self._refreshed_at = None
+        else:
+            self.resident.add(model)
+
+    async def _refresh_resident(self, deadline: Optional[Deadline] = None) -> None:
+        """Refresh the resident model set from ``api/ps`` when it is stale.
+
+        With a deadline, the lookup gets at most the remaining budget.
+        """
+        if self._fetch_resident is None:
+            return
+        now = time.monotonic()
+        if (
+            self._refreshed_at is not None
+            and now - self._refreshed_at < self._resident_ttl
+        ):
+            return
+        self._refreshed_at = now
+        try:
+            fetch = self._fetch_resident()
+            if deadline is not None:
+                fetch = asyncio.wait_for(fetch, deadline.remaining())
+            self.resident = {normalize_model(m) for m in await fetch}
+        except Exception as e:
+            logger.warning(f"Failed to fetch resident models: {e}")
+
+    def _hot(self, model: str) -> bool:
+        return model in self.resident or model in self._running
+
+    def _can_start(self, model: str) -> bool:
+        if self.saturated:
+            return False
+        return self._hot(model) or not self._running
+
+    def _pick(self) -> Optional[str]:
+        """Choose the model whose oldest waiter gets the next slot."""
+        heads = {model: queue[0][1] for model, queue in self._queues.items()}
+        if not heads:
+            return None
+
+        now = time.monotonic()
+        starving = [m for m, since in heads.items() if now - since >= self.max_wait]
+        if starving:
+            oldest = min(starving, key=heads.__getitem__)
+            # Hold back other models until the starving one can start
+            return oldest if self._can_start(oldest) else None
+
+        others_waiting = len(heads) > 1
+        if (
+            self.current in heads
+            and self._can_start(self.current)
+            and (self._streak < self.max_batch or not others_waiting)
+        ):
+            return self.current
+
+        candidates = [m for m in heads if self._can_start(m)]
+        if not candidates:
+            return None
+        if others_waiting and self._streak >= self.max_batch:
+            candidates = [m for m in candidates if m != self.current] or candidates
+        hot = [m for m in candidates if self._hot(m)]
+        return min(hot or candidates, key=heads.__getitem__)
+
+    def _dispatch(self) -> None:
+        """Grant free slots to waiting requests."""
+        while not self.saturated:
+            model = self._pick()
+            if model is None:
+                return
+
+            oldest = min(self._queues, key=lambda m: self._queues[m][0][1])
+            if oldest != model and not self._hot(oldest):
+                REORDERED_REQUESTS.inc()
+                LOAD_SECONDS_AVOIDED.inc(self._load_seconds.get(oldest, 0.0))
+
+            waiter, _ = self._queues[model].popleft()
+            QUEUED_REQUESTS.labels(model=model).dec()
+            if not self._queues[model]:
+                del self._queues[model]
+
+            if not self._hot(model):
+                MODEL_SWITCHES.inc()
+            if model == self.current:
+                self._streak += 1
+            else:
+                self.current = model
+                self._streak = 1
+            self._running[model] = self._running.get(model, 0) + 1
+            waiter.set_result(None)
@@ -0,0 +1,55 @@
+"""Rule checks for generated workout plans."""
+
+from typing import List
+
+from app.schemas.ollama import ChatRequest
+from app.schemas.ollama import WorkoutDay
+from app.schemas.ollama import WorkoutPlan
+from app.services.catalog import exercise_catalog
+
+
+def allowed_machines(request: ChatRequest) -> List[str]:
+    """Machine names a plan may use: as supplied and their canonical forms."""
+    matches = exercise_catalog.resolve(request.available_machines)
+    return list(
+        dict.fromkeys([*request.available_machines, *(m.name for m in matches)])
+    )
+
+
+def day_violations(day: WorkoutDay, request: ChatRequest) -> List[str]:
+    """Return the plan rules broken by a single day; empty when it is valid.
+
+    A day must have at least one exercise, last no longer than
+    ``workout_time`` minutes and only use machines from
+    ``available_machines``.
+    """
+    violations = []
+    if not day.exercises:
+        violations.append(f"{day.day} has no exercises")
+    minutes = sum(exercise.duration_minutes for exercise in day.exercises)
+    if minutes > request.workout_time:
+        violations.append(
+            f"{day.day} takes {minutes} minutes, over {request.workout_time}"
+        )
+    allowed = {machine.casefold() for machine in allowed_machines(request)}
+    for exercise in day.exercises:
+        if exercise.machine.casefold() not in allowed:
+            violations.append(f"{day.day} uses unavailable {exercise.machine!r}")
+    return violations
+
+
+def plan_violations(plan: WorkoutPlan, request: ChatRequest) -> List[str]:
+    """Return the plan rules broken by ``plan``; empty when it is valid.
+
+    A plan must have one day per session, at most seven, and every day
+    must pass ``day_violations``.
+    """
+    violations = []
+    days = len(plan.weekly_routine)
+    if days != min(request.sessions_per_week, 7):
+        violations.append(
+            f"plan has {days} days for {request.sessions_per_week} sessions per week"
+        )
+    for day in plan.weekly_routine:
+        violations += day_violations(day, request)
+    return violations
@@ -0,0 +1,659 @@
+"""Workout plan generation service."""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Set
+from typing import Tuple
+from typing import Type
+from typing import TypeVar
+
+from prometheus_client import Counter
+from prometheus_client import Histogram
+
+from app.core.config import settings
+from app.core.deadline import Deadline
+from app.schemas.compact import COMPACT_DAY_INSTRUCTIONS
+from app.schemas.compact import COMPACT_FORMAT_INSTRUCTIONS
+from app.schemas.compact import CompactDay
+from app.schemas.compact import CompactPlan
+from app.schemas.ollama import ChatRequest
+from app.schemas.ollama import ChatResponse
+from app.schemas.ollama import PlanEditRequest
+from app.schemas.ollama import PlanEditResponse
+from app.schemas.ollama import WorkoutDay
+from app.schemas.ollama import WorkoutPlan
+from app.services.agenta import agenta_service
+from app.services.budget import generation_budget
+from app.services.capture import capture_service
+from app.services.catalog import exercise_catalog
+from app.services.coordination import coordinator
+from app.services.ollama import ollama_service
+from app.services.routing import Route
+from app.services.routing import routing_policy
+from app.services.rules import rule_based_planner
+from app.services.validation import day_violations
+from app.services.validation import plan_violations
+
+
+logger = logging.getLogger(__name__)
+
+Result = TypeVar("Result", WorkoutPlan, WorkoutDay)
+
+COMPACT_TYPES = {WorkoutPlan: CompactPlan, WorkoutDay: CompactDay}
+
+CASCADE_ATTEMPTS = Counter(
+    "train_ai_cascade_attempts_total",
+    "Plan generation attempts per model tier and outcome",
+    ["model", "outcome"],
+)
+CASCADE_LATENCY = Histogram(
+    "train_ai_cascade_latency_seconds",
+    "Plan generation latency per model tier",
+    ["model"],
+    buckets=(0.5, 1, 2, 5, 10, 20, 30, 60, 120),
+)
+
+
+def _compact(compact: Optional[bool]) -> bool:
+    """Whether to use the compact generation format."""
+    return settings.OLLAMA_COMPACT_SCHEMA if compact is None else compact
+
+
+def _machine_keys(names: List[str]) -> Set[str]:
+    """Case-folded machine names together with their canonical forms."""
+    matches = exercise_catalog.resolve(names)
+    return {name.casefold() for name in names} | {
+        match.machine.casefold() for match in matches if match.machine
+    }
+
+
+def plan_key(request: ChatRequest) -> str:
+    """Stable key of the profile fields that determine a plan."""
+    profile = request.model_dump(
+        include={
+            "age",
+            "height",
+            "weight",
+            "physical_condition",
+            "sessions_per_week",
+            "workout_time",
+        }
+    )
+    profile["physical_condition"] = profile["physical_condition"].casefold()
+    profile["available_machines"] = sorted(
+        {m.casefold() for m in request.available_machines}
+    )
+    encoded = json.dumps(profile, sort_keys=True).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def plan_cache_key(request: ChatRequest) -> str:
+    """Key of cached plans: the profile, and the model if the request names one."""
+    key = plan_key(request)
+    return f"{key}:{request.model}" if request.model else key
+
+
+class WorkoutService:
+    """Service that turns a workout request into a validated workout plan."""
+
+    def __init__(self):
+        self._plans: "OrderedDict[str, WorkoutPlan]" = OrderedDict()
+        self._refining: Dict[str, asyncio.Task] = {}
+
+    async def build_messages(
+        self, request: ChatRequest, compact: Optional[bool] = None
+    ) -> List[Dict[str, str]]:
+        """Build the chat messages for a request from the Agenta prompt."""
+        # Get structured messages from Agenta
+        messages = await agenta_service.get_messages()
+
+        # Template the user message with actual data
+        user_template = None
+        system_message = None
+
+        # Extract system and user messages from Agenta
+        for msg in messages:
+            if msg["role"] == "system":
+                system_message = msg
+            elif msg["role"] == "user":
+                user_template = msg["content"]
+
+        if not user_template:
+            raise ValueError("No user message template found in Agenta configuration")
+
+        # Use safe string replacement to avoid conflicts with JSON braces
+        templated_user_message = user_template
+
+        # Resolve free-text machines to canonical catalog machines
+        matches = exercise_catalog.resolve(request.available_machines)
+        shortlist = exercise_catalog.shortlist(
+            matches, settings.EXERCISE_SHORTLIST_SIZE
+        )
+
+        # Replace placeholders ({{variable}} avoids clashing with JSON braces)
+        replacements = {
+            "{{age}}": str(request.age),
+            "{{height}}": str(request.height),
+            "{{weight}}": str(request.weight),
+            "{{physical_condition}}": request.physical_condition,
+            "{{sessions_per_week}}": str(request.sessions_per_week),
+            "{{workout_time}}": str(request.workout_time),
+            "{{available_machines}}": ", ".join(m.name for m in matches),
+            "{{exercise_shortlist}}": exercise_catalog.format_shortlist(shortlist),
+        }
+
+        for placeholder, value in replacements.items():
+            templated_user_message = templated_user_message.replace(placeholder, value)
+
+        logger.debug(f"Templated user message: {templated_user_message}")
+
+        # Build final messages array
+        final_messages = []
+        if system_message:
+            final_messages.append(system_message)
+        if _compact(compact):
+            templated_user_message += "\n" + COMPACT_FORMAT_INSTRUCTIONS
+        final_messages.append({"role": "user", "content": templated_user_message})
+        return final_messages
+
+    def plan_schema(
+        self,
+        request: ChatRequest,
+        result_type: Type[Result] = WorkoutPlan,
+        day: Optional[str] = None,
+        compact: Optional[bool] = None,
+    ) -> Dict[str, Any]:
+        """Structured-output schema restricting machines to the available ones.
+
+        With the compact format the schema is the short-key ``CompactPlan``
+        or ``CompactDay`` instead, which leaves out the user profile.
+        """
+        if _compact(compact):
+            schema = COMPACT_TYPES[result_type].model_json_schema()
+            exercise = schema["$defs"]["CompactExercise"]["properties"]
+            machine, day_key = exercise["m"], "d"
+        else:
+            schema = result_type.model_json_schema()
+            machine = schema["$defs"]["Exercise"]["properties"]["machine"]
+            day_key = "day"
+
+        machines = [
+            m.name for m in exercise_catalog.resolve(request.available_machines)
+        ]
+        if machines:
+            machine["enum"] = list(dict.fromkeys(machines))
+        if day is not None:
+            schema["properties"][day_key]["enum"] = [day]
+        return schema
+
+    def parse_result(
+        self,
+        result_type: Type[Result],
+        output: str,
+        request: ChatRequest,
+        compact: Optional[bool] = None,
+    ) -> Result:
+        """Parse model output into a public plan or day."""
+        data = json.loads(output)
+        if not _compact(compact):
+            return result_type(**data)
+        if result_type is WorkoutPlan:
+            return CompactPlan(**data).expand(request)
+        return CompactDay(**data).expand()
+
+    def model_tiers(self, request: ChatRequest) -> List[str]:
+        """Models to try in order: the requested model or the configured cascade."""
+        if request.model:
+            return [request.model]
+        cascade = [m.strip() for m in settings.OLLAMA_MODEL_CASCADE.split(",")]
+        return [m for m in cascade if m] or [ollama_service.default_model]
+
+    def _admit(
+        self, model: str, num_predict: Optional[int], deadline: Optional[Deadline]
+    ) -> None:
+        """Refuse a generation whose expected duration exceeds the deadline."""
+        if deadline is None:
+            return
+        remaining = deadline.observe("admission")
+        expected = generation_budget.estimate_seconds(model, num_predict)
+        if expected is not None and expected > remaining:
+            deadline.reject(
+                "admission",
+                f"Plan needs about {expected:.1f}s but only "
+                f"{remaining:.1f}s of the deadline remain",
+            )
+
+    async def _generate_with(
+        self,
+        model: str,
+        request: ChatRequest,
+        messages: List[Dict[str, str]],
+        schema: Dict[str, Any],
+        deadline: Optional[Deadline],
+        result_type: Type[Result],
+        check: Callable[[Result, ChatRequest], List[str]],
+    ) -> Tuple[Result, List[str]]:
+        """Generate a result with one model and check it against the plan rules.
+
+        An output cut off at ``num_predict`` raises the model's size estimate
+        and is retried once with the larger budget, unless the client's
+        ``max_tokens`` set the limit.
+        """
+        sessions = request.sessions_per_week if result_type is WorkoutPlan else 1
+
+        def budget() -> Optional[int]:
+            return generation_budget.num_predict(
+                model, sessions, request.workout_time, request.max_tokens
+            )
+
+        num_predict = budget()
+        self._admit(model, num_predict, deadline)
+
+        started = time.perf_counter()
+        outcome = "error"
+        retried = False
+        try:
+            while True:
+                response = await ollama_service.chat_with_system(
+                    messages,
+                    model,
+                    request.temperature,
+                    num_predict,
+                    format_schema=schema,
+                    deadline=deadline,
+                )
+                generation_budget.observe(
+                    model, response, sessions, request.workout_time
+                )
+                if response.done_reason != "length" or retried:
+                    break
+                retry = budget()
+                if retry is None or num_predict is None or retry <= num_predict:
+                    break
+                logger.warning(
+                    f"Output from {model} was cut off at {num_predict} tokens, "
+                    f"retrying with {retry}"
+                )
+                self._capture(result_type, request, messages, response, False, [])
+                num_predict, retried = retry, True
+                self._admit(model, num_predict, deadline)
+
+            # Parse the JSON response and return as structured data
+            outcome = "invalid"
+            try:
+                result = self.parse_result(result_type, response.response, request)
+            except (json.JSONDecodeError, ValueError) as e:
+                logger.error(f"Failed to parse workout plan JSON from {model}: {e}")
+                self._capture(result_type, request, messages, response, False, [])
+                raise ValueError("Failed to parse workout plan from AI response")
+
+            violations = check(result, request)
+            self._capture(result_type, request, messages, response, True, violations)
+            outcome = "rule_violation" if violations else "accepted"
+            return result, violations
+        finally:
+            CASCADE_ATTEMPTS.labels(model=model, outcome=outcome).inc()
+            CASCADE_LATENCY.labels(model=model).observe(time.perf_counter() - started)
+
+    def _capture(
+        self,
+        result_type: Type[Result],
+        request: ChatRequest,
+        messages: List[Dict[str, str]],
+        response: ChatResponse,
+        parsed: bool,
+        violations: List[str],
+    ) -> None:
+        """Hand a generation to the dataset capture, if it is running."""
+        if capture_service.running:
+            capture_service.record(
+                "plan" if result_type is WorkoutPlan else "day",
+                request,
+                plan_key(request),
+                agenta_service.prompt_version,
+                messages,
+                response,
+                parsed,
+                violations,
+                "compact" if _compact(None) else "full",
+            )
+
+    async def _cascade(
+        self,
+        request: ChatRequest,
+        messages: List[Dict[str, str]],
+        schema: Dict[str, Any],
+        deadline: Optional[Deadline],
+        result_type: Type[Result],
+        check: Callable[[Result, ChatRequest], List[str]],
+    ) -> Result:
+        """Try the model tiers in order until one passes ``check``.
+
+        Only output that cannot be parsed or breaks the plan rules moves the
+        request up a tier; upstream errors are raised straight away. If no
+        tier produces a valid result, the last rule-breaking result is
+        returned rather than failing the request.
+        """
+        fallback: Optional[Result] = None
+        error: Optional[Exception] = None
+        for model in self.model_tiers(request):
+            try:
+                result, violations = await self._generate_with(
+                    model, request, messages, schema, deadline, result_type, check
+                )
+            except ValueError as e:
+                logger.warning(f"Model {model} failed to produce a plan: {e}")
+                error = e
+                continue
+            except Exception:
+                # Deadline and upstream errors would hit every tier alike
+                if fallback is None:
+                    raise
+                break
+
+            if not violations:
+                logger.info(f"Successfully parsed workout plan from {model}")
+                return result
+            logger.warning(f"Plan from {model} breaks plan rules: {violations}")
+            fallback = result
+
+        if fallback is not None:
+            logger.warning("No model produced a valid plan, returning the last one")
+            return fallback
+        raise error
+
+    async def generate_plan(
+        self, request: ChatRequest, deadline: Optional[Deadline] = None
+    ) -> WorkoutPlan:
+        """Generate a workout plan along the route chosen for the request.
+
+        Every route first looks for an LLM plan of the same profile in this
+        worker's or the shared cache. Without one, the LLM route generates
+        and caches a plan; rule-based routes return the rule-based plan and
+        ``rules_then_llm`` also schedules an LLM refinement for later
+        requests. A rule-based plan that breaks the plan rules is replaced by
+        an LLM plan.
+        """
+        route = routing_policy.route(request)
+        key = plan_cache_key(request)
+        cached = await self._cached_plan(key)
+        if cached is not None:
+            coordinator.incr("plan_cache_hits")
+            return cached
+        coordinator.incr("plan_cache_misses")
+
+        if route is Route.LLM:
+            return await self._generate_and_cache(key, request, deadline)
+
+        workout_plan = rule_based_planner.build(request)
+        violations = plan_violations(workout_plan, request)
+        if violations:
+            logger.warning(f"Rule-based plan breaks plan rules: {violations}")
+            return await self._generate_and_cache(key, request, deadline)
+        if route is Route.RULES_THEN_LLM:
+            self._schedule_refinement(key, request)
+        return workout_plan
+
+    async def _cached_plan(self, key: str) -> Optional[WorkoutPlan]:
+        """LLM plan for ``key`` from this worker's or the shared cache."""
+        if key in self._plans:
+            self._plans.move_to_end(key)
+            return self._plans[key]
+        cached = await coordinator.cache_get(f"plan:{key}")
+        if cached is None:
+            return None
+        workout_plan = WorkoutPlan.model_validate_json(cached)
+        self._remember(key, workout_plan)
+        return workout_plan
+
+    def _remember(self, key: str, workout_plan: WorkoutPlan) -> None:
+        self._plans[key] = workout_plan
+        while len(self._plans) > settings.PLAN_CACHE_SIZE:
+            self._plans.popitem(last=False)
+
+    async def _generate_and_cache(
+        self, key: str, request: ChatRequest, deadline: Optional[Deadline] = None
+    ) -> WorkoutPlan:
+        """Generate an LLM plan and cache it if it follows the plan rules."""
+        workout_plan = await self.generate_llm_plan(request, deadline)
+        if not plan_violations(workout_plan, request):
+            self._remember(key, workout_plan)
+            await coordinator.cache_set(
+                f"plan:{key}", workout_plan.model_dump_json(), settings.PLAN_CACHE_TTL
+            )
+        return workout_plan
+
+    def _schedule_refinement(self, key: str, request: ChatRequest) -> None:
+        """Generate an LLM plan for ``request`` in the background and cache it.
+
+        Workers claim the refinement through the shared cache, so each
+        profile is refined by one worker at a time.
+        """
+        if key in self._refining:
+            return
+
+        async def refine() -> None:
+            claim = f"refining:{key}"
+            try:
+                lease = settings.COORDINATION_SLOT_LEASE
+                if not await coordinator.cache_add(claim, str(os.getpid()), lease):
+                    return
+                try:
+                    await self._generate_and_cache(key, request)
+                finally:
+                    await coordinator.cache_delete(claim)
+            except Exception as e:
+                logger.warning(f"Background plan refinement failed: {e}")
+            finally:
+                self._refining.pop(key, None)
+
+        self._refining[key] = asyncio.create_task(refine())
+
+    async def generate_llm_plan(
+        self, request: ChatRequest, deadline: Optional[Deadline] = None
+    ) -> WorkoutPlan:
+        """Generate a workout plan for a request using Ollama.
+
+        Models from ``model_tiers`` are tried smallest first; the next tier is
+        only used when a response cannot be parsed or breaks the plan rules.
+
+        ``num_predict`` is sized from the requested sessions, their length
+        and the plan sizes observed for the model. With a deadline, requests whose
+        expected generation time exceeds the remaining budget are refused
+        before any work is queued.
+        """
+        final_messages = await self.build_messages(request)
+
+        # Use structured outputs with Pydantic schema
+        workout_schema = self.plan_schema(request)
+
+        return await self._cascade(
+            request,
+            final_messages,
+            workout_schema,
+            deadline,
+            WorkoutPlan,
+            plan_violations,
+        )
+
+    def affected_days(self, edit: PlanEditRequest) -> List[int]:
+        """Positions of the plan days that an edit invalidates.
+
+        A day is affected when it is the edited ``day``, uses a removed
+        machine, or (for a week-wide ``workout_time`` change) runs over a
+        shorter limit; lengthening every session affects every day.
+        """
+        removed = _machine_keys(edit.remove_machines)
+        previous_time = edit.plan.user_profile.workout_time_per_session
+
+        affected = []
+        for position, day in enumerate(edit.plan.weekly_routine):
+            if edit.day is not None and day.day.casefold() == edit.day.casefold():
+                affected.append(position)
+            elif removed & _machine_keys([e.machine for e in day.exercises]):
+                affected.append(position)
+            elif edit.workout_time is not None and edit.day is None:
+                minutes = sum(e.duration_minutes for e in day.exercises)
+                if edit.workout_time > previous_time or minutes > edit.workout_time:
+                    affected.append(position)
+        return affected
+
+    def _edited_request(self, edit: PlanEditRequest) -> ChatRequest:
+        """Build the request describing the plan after the edit."""
+        profile = edit.plan.user_profile
+        removed = _machine_keys(edit.remove_machines)
+        machines = [
+            machine
+            for machine in edit.available_machines
+            if not removed & _machine_keys([machine])
+        ]
+        workout_time = profile.workout_time_per_session
+        if edit.workout_time is not None and edit.day is None:
+            workout_time = edit.workout_time
+        return ChatRequest(
+            model=edit.model,
+            age=profile.age,
+            height=profile.height,
+            weight=profile.weight,
+            physical_condition=profile.physical_condition,
+            sessions_per_week=profile.training_frequency,
+            workout_time=workout_time,
+            available_machines=list(dict.fromkeys(machines + edit.add_machines)),
+            temperature=edit.temperature,
+        )
+
+    def build_day_messages(
+        self,
+        request: ChatRequest,
+        day: str,
+        kept_days: List[WorkoutDay],
+        system_message: Optional[Dict[str, str]],
+    ) -> List[Dict[str, str]]:
+        """Build the messages asking for one day of an existing plan."""
+        matches = exercise_catalog.resolve(request.available_machines)
+        shortlist = exercise_catalog.shortlist(
+            matches, settings.EXERCISE_SHORTLIST_SIZE
+        )
+        lines = [
+            f"Regenerate only the {day} session of an existing weekly workout plan.",
+            f"Person: {request.age} years, {request.height} cm, "
+            f"{request.weight} kg, {request.physical_condition}.",
+            f"Session length: at most {request.workout_time} minutes.",
+            f"Available machines: {', '.join(m.name for m in matches)}.",
+        ]
+        if shortlist:
+            lines.append(
+                f"Suggested exercises: {exercise_catalog.format_shortlist(shortlist)}."
+            )
+        if kept_days:
+            lines.append(
+                "Other days stay unchanged; complement them instead of repeating them:"
+            )
+            lines += [
+                f"- {kept.day}: "
+                + ", ".join(
+                    f"{e.exercise_name} on {e.machine} ({e.duration_minutes} min)"
+                    for e in kept.exercises
+                )
+                for kept in kept_days
+            ]
+        lines.append(f"Return only the {day} workout.")
+        if _compact(None):
+            lines.append(COMPACT_DAY_INSTRUCTIONS)
+
+        messages = [system_message] if system_message else []
+        messages.append({"role": "user", "content": "\n".join(lines)})
+        return messages
+
+    async def _system_message(self) -> Optional[Dict[str, str]]:
+        """System message of the Agenta prompt, if it has one."""
+        system_message = None
+        for msg in await agenta_service.get_messages():
+            if msg["role"] == "system":
+                system_message = msg
+        return system_message
+
+    async def edit_plan(
+        self, edit: PlanEditRequest, deadline: Optional[Deadline] = None
+    ) -> PlanEditResponse:
+        """Apply an edit to a plan, regenerating only the affected days.
+
+        Affected days are regenerated concurrently, each with the untouched
+        days as context, and merged back in their original positions. When
+        ``PLAN_ROUTING`` forces ``rules``, days come from the rule-based
+        planner and only days it cannot serve go to the LLM.
+        """
+        request = self._edited_request(edit)
+        affected = self.affected_days(edit)
+        routine = list(edit.plan.weekly_routine)
+        kept_days = [d for i, d in enumerate(routine) if i not in affected]
+        use_rules = settings.PLAN_ROUTING == Route.RULES.value and (
+            rule_based_planner.supports(request)
+        )
+
+        system_message = None
+        if affected and not use_rules:
+            system_message = await self._system_message()
+
+        async def regenerate(position: int) -> WorkoutDay:
+            name = routine[position].day
+            day_request = request
+            if edit.day is not None and edit.workout_time is not None:
+                day_request = request.model_copy(
+                    update={"workout_time": edit.workout_time}
+                )
+            system = system_message
+            if use_rules:
+                new_day = rule_based_planner.build_day(day_request, position, name)
+                violations = day_violations(new_day, day_request)
+                if not violations:
+                    return new_day
+                logger.warning(f"Rule-based {name} breaks plan rules: {violations}")
+                system = await self._system_message()
+            schema = self.plan_schema(day_request, WorkoutDay, day=name)
+            messages = self.build_day_messages(day_request, name, kept_days, system)
+            new_day = await self._cascade(
+                day_request, messages, schema, deadline, WorkoutDay, day_violations
+            )
+            return new_day.model_copy(update={"day": name})
+
+        tasks = [asyncio.ensure_future(regenerate(i)) for i in affected]
+        try:
+            new_days = await asyncio.gather(*tasks)
+        except BaseException:
+            # gather leaves the other days running, holding upstream slots
+            # for a response that is already an error
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        for position, new_day in zip(affected, new_days):
+            routine[position] = new_day
+
+        user_profile = edit.plan.user_profile.model_copy(
+            update={"workout_time_per_session": request.workout_time}
+        )
+        logger.info(
+            f"Edited plan: reused {len(kept_days)} days, "
+            f"regenerated {len(affected)}"
+        )
+        return PlanEditResponse(
+            plan=WorkoutPlan(user_profile=user_profile, weekly_routine=routine),
+            reused_days=len(kept_days),
+            regenerated_days=len(affected),
+            regenerated=[routine[i].day for i in affected],
+        )
+
+
+# Create global service instance
+workout_service = WorkoutService()
@@ -1,12 +1,188 @@
 """Command-line interface."""
+import asyncio
+import gzip
+import json
+from pathlib import Path
+from typing import Optional
+
 import click
 
 
-@click.command()
+@click.group(invoke_without_command=True)
 @click.version_option()
 def main() -> None:
     """Train Ai."""
 
 
+@main.command()
+@click.argument(
+    "profiles", type=click.Path(exists=True, dir_okay=False, path_type=Path)
+)
+@click.option(
+    "--output-dir",
+    "-o",
+    type=click.Path(file_okay=False, path_type=Path),
+    default=Path("plans"),
+    show_default=True,
+    help="Directory for plan shards and the resume checkpoint.",
+)
+@click.option(
+    "--concurrency",
+    "-c",
+    type=click.IntRange(min=1),
+    default=4,
+    show_default=True,
+    help="Maximum number of plans generated at the same time.",
+)
+@click.option(
+    "--shard-size",
+    type=click.IntRange(min=1),
+    default=1000,
+    show_default=True,
+    help="Maximum number of plans per compressed JSONL shard.",
+)
+@click.option(
+    "--progress-interval",
+    type=click.FloatRange(min=0.1),
+    default=10.0,
+    show_default=True,
+    help="Seconds between throughput and ETA reports.",
+)
+def bulk(
+    profiles: Path,
+    output_dir: Path,
+    concurrency: int,
+    shard_size: int,
+    progress_interval: float,
+) -> None:
+    """Pre-generate workout plans for a JSONL or CSV file of PROFILES.
+
+    Re-running the command with the same output directory resumes an
+    interrupted run.
+    """
+    from app.services.workout import workout_service
+    from train_ai.bulk import run_bulk
+
+    progress = asyncio.run(
+        run_bulk(
+            profiles,
+            output_dir,
+            workout_service.generate_plan,
+            concurrency=concurrency,
+            shard_size=shard_size,
+            progress_interval=progress_interval,
+            report=lambda p: click.echo(p.format(), err=True),
+        )
+    )
+    if progress.failed:
+        raise click.ClickException(
+            f"{progress.failed} profiles failed; re-run to retry them"
+        )
+
+
+@main.command()
+@click.option("--host", default="0.0.0.0", show_default=True, help="Interface to bind.")
+@click.option("--port", type=int, default=8000, show_default=True, help="Port to bind.")
+@click.option(
+    "--workers",
+    "-w",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Number of worker processes  [default: one per CPU]",
+)
+@click.option(
+    "--preload/--no-preload",
+    default=True,
+    show_default=True,
+    help="Import the app in the master so workers share it copy-on-write.",
+)
+def serve(host: str, port: int, workers: Optional[int], preload: bool) -> None:
+    """Run the API with a production server."""
+    from train_ai import serve as server
+
+    workers = workers or server.default_workers()
+    if preload and not server.can_preload():
+        click.echo(
+            "gunicorn is not installed: uvicorn workers import the app "
+            "themselves, so it is not preloaded",
+            err=True,
+        )
+        preload = False
+    click.echo(
+        f"Serving {server.APP} on {host}:{port} with {workers} workers "
+        f"({server.event_loop()} loop, {server.http_protocol()} HTTP parser)",
+        err=True,
+    )
+    if preload:
+        timings = server.preload()
+        breakdown = ", ".join(f"{step} {sec:.3f}s" for step, sec in timings.items())
+        click.echo(f"Preloaded in {sum(timings.values()):.3f}s: {breakdown}", err=True)
+    server.run(host, port, workers, preload)
+
+
+@main.command("export-dataset")
+@click.argument(
+    "capture_dir", type=click.Path(exists=True, file_okay=False, path_type=Path)
+)
+@click.argument("output", type=click.Path(dir_okay=False, path_type=Path))
+@click.option(
+    "--valid-only",
+    is_flag=True,
+    help="Skip generations that failed parsing or broke plan rules.",
+)
+def export_dataset(capture_dir: Path, output: Path, valid_only: bool) -> None:
+    """Export captured generations in CAPTURE_DIR as a deduplicated dataset.
+
+    OUTPUT is written as JSONL, gzip-compressed if it ends in ".gz".
+    """
+    from app.services.capture import export_dataset as iter_dataset
+
+    opener = gzip.open if output.suffix == ".gz" else open
+    count = 0
+    with opener(output, "wt", encoding="utf-8") as handle:
+        for record in iter_dataset(capture_dir, valid_only=valid_only):
+            handle.write(json.dumps(record, separators=(",", ":")) + "\n")
+            count += 1
+    click.echo(f"Exported {count} records to {output}", err=True)
+
+
+@main.command()
+@click.argument(
+    "profiles", type=click.Path(exists=True, dir_okay=False, path_type=Path)
+)
+@click.option(
+    "--runs",
+    "-n",
+    type=click.IntRange(min=1),
+    default=3,
+    show_default=True,
+    help="Generations per profile and schema.",
+)
+@click.option("--model", "-m", default=None, help="Ollama model to benchmark.")
+def benchmark(profiles: Path, runs: int, model: Optional[str]) -> None:
+    """Compare tokens and latency of the full and compact plan schemas.
+
+    Every profile in PROFILES (JSONL or CSV, as for "bulk") is generated
+    with both schemas against the configured Ollama server.
+    """
+    from train_ai.benchmark import run_benchmark
+
+    summaries = asyncio.run(run_benchmark(profiles, runs, model))
+    click.echo(
+        f"{'schema':<8} {'runs':>5} {'failed':>6} {'prompt tok':>10} "
+        f"{'output tok':>10} {'latency s':>9}"
+    )
+    for s in summaries:
+        numbers = [
+            "-" if s[key] is None else f"{s[key]:.1f}"
+            for key in ("prompt_tokens", "output_tokens")
+        ]
+        latency = "-" if s["latency_seconds"] is None else f"{s['latency_seconds']:.2f}"
+        click.echo(
+            f"{s['schema']:<8} {s['runs']:>5} {s['failures']:>6} "
+            f"{numbers[0]:>10} {numbers[1]:>10} {latency:>9}"
+        )
+
+
 if __name__ == "__main__":
     main(prog_name="train-ai")  # pragma: no cover
@@ -0,0 +1,120 @@
+"""Token and latency benchmark of the full and compact generation schemas."""
+import logging
+import statistics
+import time
+from pathlib import Path
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+
+from app.schemas.ollama import ChatRequest
+from app.schemas.ollama import WorkoutPlan
+
+
+logger = logging.getLogger(__name__)
+
+SCHEMAS = {"full": False, "compact": True}
+
+
+class SchemaStats:
+    """Measurements of the generations made with one schema."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.prompt_tokens: List[int] = []
+        self.output_tokens: List[int] = []
+        self.latencies: List[float] = []
+        self.failures = 0
+
+    def add(self, prompt_tokens: int, output_tokens: int, latency: float) -> None:
+        """Record one parsed generation."""
+        self.prompt_tokens.append(prompt_tokens)
+        self.output_tokens.append(output_tokens)
+        self.latencies.append(latency)
+
+    def summary(self) -> Dict[str, Any]:
+        """Means over the parsed generations, and the failure count."""
+
+        def mean(values: List[float]) -> Optional[float]:
+            return statistics.fmean(values) if values else None
+
+        return {
+            "schema": self.name,
+            "runs": len(self.latencies),
+            "failures": self.failures,
+            "prompt_tokens": mean(self.prompt_tokens),
+            "output_tokens": mean(self.output_tokens),
+            "latency_seconds": mean(self.latencies),
+        }
+
+
+async def run_benchmark(
+    path: Path, runs: int, model: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """Generate a plan for every profile in ``path`` with each schema.
+
+    Schemas alternate per run so that model warm-up and server load affect
+    both equally. ``num_predict`` is sized as in production, with a
+    separate generation budget per schema that learns from its own
+    outputs. Token counts are Ollama's ``prompt_eval_count`` and
+    ``eval_count``; latency is the wall time of the upstream call.
+
+    Args:
+        path: JSONL or CSV file of profiles, as read by ``bulk``.
+        runs: Generations per profile and schema.
+        model: Ollama model, defaulting to the configured one.
+
+    Returns:
+        One summary per schema.
+    """
+    from app.services.budget import GenerationBudget
+    from app.services.ollama import ollama_service
+    from app.services.workout import workout_service
+    from train_ai.bulk import read_profiles
+
+    stats = {name: SchemaStats(name) for name in SCHEMAS}
+    budgets = {name: GenerationBudget() for name in SCHEMAS}
+    for _, profile in read_profiles(path):
+        request = ChatRequest(**profile)
+        model_name = model or request.model or ollama_service.default_model
+        for _ in range(runs):
+            for name, compact in SCHEMAS.items():
+                messages = await workout_service.build_messages(request, compact)
+                schema = workout_service.plan_schema(request, compact=compact)
+                num_predict = budgets[name].num_predict(
+                    model_name,
+                    request.sessions_per_week,
+                    request.workout_time,
+                    request.max_tokens,
+                )
+                started = time.perf_counter()
+                try:
+                    response = await ollama_service.chat_with_system(
+                        messages,
+                        model=model_name,
+                        temperature=request.temperature,
+                        max_tokens=num_predict,
+                        format_schema=schema,
+                    )
+                    latency = time.perf_counter() - started
+                    budgets[name].observe(
+                        model_name,
+                        response,
+                        request.sessions_per_week,
+                        request.workout_time,
+                    )
+                    workout_service.parse_result(
+                        WorkoutPlan, response.response, request, compact
+                    )
+                except Exception as e:
+                    # Upstream errors and unparseable output both count
+                    logger.warning(f"{name} schema generation failed: {e}")
+                    stats[name].failures += 1
+                    continue
+                stats[name].add(
+                    response.prompt_eval_count or 0,
+                    response.eval_count or 0,
+                    latency,
+                )
+    return [s.summary() for s in stats.values()]
@@ -0,0 +1,225 @@
+"""Bulk, resumable pre-generation of workout plans."""
+import asyncio
+import csv
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Any
+from typing import Awaitable
+from typing import Callable
+from typing import Dict
+from typing import Iterator
+from typing import Optional
+from typing import Set
+from typing import Tuple
+
+from app.core.shards import ShardWriter
+from app.schemas.ollama import ChatRequest
+from app.schemas.ollama import WorkoutPlan
+
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_FILE = "checkpoint.txt"
+SHARD_PREFIX = "plans"
+
+Generate = Callable[[ChatRequest], Awaitable[WorkoutPlan]]
+
+
+def read_profiles(path: Path) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Stream ``(key, profile)`` pairs from a JSONL or CSV file.
+
+    The key is the row's ``id`` field when present, otherwise its position
+    in the file. In CSV files ``available_machines`` is ``;``-separated and
+    empty cells are treated as missing.
+
+    Args:
+        path: JSONL (``.jsonl``/``.ndjson``) or CSV (``.csv``) file.
+
+    Yields:
+        The key and raw profile fields of every row.
+    """
+    with open(path, newline="", encoding="utf-8") as handle:
+        if path.suffix.lower() == ".csv":
+            for index, row in enumerate(csv.DictReader(handle)):
+                profile: Dict[str, Any] = {k: v for k, v in row.items() if v}
+                machines = profile.get("available_machines", "")
+                profile["available_machines"] = [
+                    m.strip() for m in machines.split(";") if m.strip()
+                ]
+                yield str(profile.pop("id", index)), profile
+        else:
+            index = 0
+            for line in handle:
+                if not line.strip():
+                    continue
+                profile = json.loads(line)
+                yield str(profile.pop("id", index)), profile
+                index += 1
+
+
+class BulkProgress:
+    """Throughput and ETA bookkeeping for a bulk run."""
+
+    def __init__(self, total: int, skipped: int = 0):
+        self.total = total
+        self.skipped = skipped
+        self.completed = 0
+        self.failed = 0
+        self.started = time.monotonic()
+
+    @property
+    def rate(self) -> float:
+        """Plans generated per second since the run started."""
+        elapsed = time.monotonic() - self.started
+        return self.completed / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def eta_seconds(self) -> Optional[float]:
+        """Estimated seconds until all remaining rows are processed."""
+        remaining = self.total - self.completed - self.failed
+        if remaining <= 0:
+            return 0.0
+        if not self.rate:
+            return None
+        return remaining / self.rate
+
+    def format(self) -> str:
+        """Render a one-line progress report."""
+        eta = self.eta_seconds
+        eta_text = "?" if eta is None else time.strftime("%H:%M:%S", time.gmtime(eta))
+        return (
+            f"{self.completed}/{self.total} plans, {self.failed} failed, "
+            f"{self.skipped} resumed, {self.rate:.2f} plans/s, ETA {eta_text}"
+        )
+
+
+class _Checkpoint:
+    """Append-only log of row keys whose plans are safely on disk."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.done: Set[str] = set()
+        if path.exists():
+            with open(path, encoding="utf-8") as handle:
+                self.done = {line.strip() for line in handle if line.strip()}
+        self._handle = open(path, "a", encoding="utf-8")
+
+    def commit(self, keys: Set[str]) -> None:
+        """Durably mark ``keys`` as done."""
+        if keys:
+            self._handle.write("".join(f"{key}\n" for key in sorted(keys)))
+            self._handle.flush()
+            self.done |= keys
+
+    def close(self) -> None:
+        """Close the checkpoint log."""
+        self._handle.close()
+
+
+async def run_bulk(
+    profiles_path: Path,
+    output_dir: Path,
+    generate: Generate,
+    concurrency: int = 4,
+    shard_size: int = 1000,
+    checkpoint_every: int = 50,
+    progress_interval: float = 10.0,
+    report: Optional[Callable[[BulkProgress], None]] = None,
+) -> BulkProgress:
+    """Generate plans for every profile in a file and stream them to shards.
+
+    Rows are read lazily and at most ``concurrency`` generations run at a
+    time, so memory stays bounded regardless of input size. Plans are
+    written to gzip JSONL shards in ``output_dir``; every
+    ``checkpoint_every`` plans the shard is flushed and the finished keys
+    are appended to a checkpoint log. Re-running with the same arguments
+    skips keys already in the log, so an interrupted run resumes where it
+    left off (plans written after the last checkpoint may be generated
+    twice). Failed rows are not checkpointed and are retried on resume.
+
+    Args:
+        profiles_path: JSONL or CSV file of ``ChatRequest`` fields.
+        output_dir: Directory for shards and the checkpoint log.
+        generate: Coroutine function turning a request into a plan.
+        concurrency: Maximum number of generations in flight.
+        shard_size: Maximum number of plans per shard.
+        checkpoint_every: Number of plans between checkpoints.
+        progress_interval: Seconds between progress reports.
+        report: Callback receiving progress every ``progress_interval``.
+
+    Returns:
+        Final progress of the run.
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    checkpoint = _Checkpoint(output_dir / CHECKPOINT_FILE)
+    total = skipped = 0
+    for key, _ in read_profiles(profiles_path):
+        if key in checkpoint.done:
+            skipped += 1
+        else:
+            total += 1
+    progress = BulkProgress(total, skipped)
+
+    writer = ShardWriter(output_dir, SHARD_PREFIX, max_records=shard_size)
+    queue: "asyncio.Queue[Optional[Tuple[str, Dict[str, Any]]]]" = asyncio.Queue(
+        maxsize=concurrency * 2
+    )
+    pending: Set[str] = set()
+
+    def commit() -> None:
+        writer.flush()
+        checkpoint.commit(set(pending))
+        pending.clear()
+
+    async def produce() -> None:
+        for key, profile in read_profiles(profiles_path):
+            if key not in checkpoint.done:
+                await queue.put((key, profile))
+        for _ in range(concurrency):
+            await queue.put(None)
+
+    async def consume() -> None:
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            key, profile = item
+            try:
+                request = ChatRequest(**profile)
+                plan = await generate(request)
+            except Exception as e:
+                logger.error(f"Failed to generate plan for {key}: {e}")
+                progress.failed += 1
+                continue
+            writer.write(
+                {
+                    "id": key,
+                    "request": request.model_dump(exclude_none=True),
+                    "plan": plan.model_dump(),
+                }
+            )
+            pending.add(key)
+            progress.completed += 1
+            if len(pending) >= checkpoint_every:
+                commit()
+
+    async def reporter() -> None:
+        while True:
+            await asyncio.sleep(progress_interval)
+            if report:
+                report(progress)
+
+    reporting = asyncio.create_task(reporter())
+    try:
+        await asyncio.gather(produce(), *(consume() for _ in range(concurrency)))
+    finally:
+        reporting.cancel()
+        commit()
+        writer.close()
+        checkpoint.close()
+
+    if report:
+        report(progress)
+    return progress
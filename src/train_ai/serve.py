@@ -0,0 +1,112 @@
+"""Production server runner."""
+import importlib
+import importlib.util
+import logging
+import os
+import time
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Tuple
+
+
+logger = logging.getLogger(__name__)
+
+APP = "app.main:app"
+
+# Imported one after another so each step's time excludes the previous ones
+PRELOAD_STEPS: List[Tuple[str, Callable[[], Any]]] = [
+    ("fastapi", lambda: importlib.import_module("fastapi")),
+    ("settings", lambda: importlib.import_module("app.core.config")),
+    ("services", lambda: importlib.import_module("app.services.workout")),
+    ("app", lambda: importlib.import_module("app.main")),
+    ("agenta sdk", lambda: importlib.import_module("agenta")),
+    (
+        "catalog",
+        lambda: importlib.import_module("app.services.catalog").exercise_catalog.load(),
+    ),
+]
+
+
+def default_workers() -> int:
+    """One worker per CPU available to this process."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # pragma: no cover - not available on macOS
+        return os.cpu_count() or 1
+
+
+def event_loop() -> str:
+    """Fastest event loop implementation that is installed."""
+    return "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+
+
+def http_protocol() -> str:
+    """Fastest HTTP parser that is installed."""
+    return "httptools" if importlib.util.find_spec("httptools") else "h11"
+
+
+def can_preload() -> bool:
+    """Whether workers are forked from this process and can share a preload.
+
+    Only gunicorn forks; uvicorn spawns workers that import everything again.
+    """
+    return importlib.util.find_spec("gunicorn") is not None
+
+
+def preload() -> Dict[str, float]:
+    """Import the application and its heavy dependencies.
+
+    Run in the master before forking, so workers share the imported modules
+    and the exercise index copy-on-write.
+
+    Returns:
+        Seconds spent in each step.
+    """
+    timings = {}
+    for step, load in PRELOAD_STEPS:
+        started = time.perf_counter()
+        load()
+        timings[step] = time.perf_counter() - started
+    return timings
+
+
+def run(host: str, port: int, workers: int, preload_app: bool) -> None:
+    """Serve the application, with gunicorn when it is installed.
+
+    Args:
+        host: Interface to bind.
+        port: Port to bind.
+        workers: Number of worker processes.
+        preload_app: Whether to import the application before forking.
+    """
+    if not can_preload():
+        logger.warning("gunicorn is not installed, falling back to uvicorn workers")
+        import uvicorn
+
+        uvicorn.run(
+            APP,
+            host=host,
+            port=port,
+            workers=workers,
+            loop=event_loop(),
+            http=http_protocol(),
+        )
+        return
+
+    from gunicorn.app.base import BaseApplication
+
+    class Application(BaseApplication):  # type: ignore[misc]
+        """Gunicorn application running the app in uvicorn workers."""
+
+        def load_config(self) -> None:
+            self.cfg.set("bind", f"{host}:{port}")
+            self.cfg.set("workers", workers)
+            self.cfg.set("worker_class", "uvicorn.workers.UvicornWorker")
+            self.cfg.set("preload_app", preload_app)
+
+        def load(self) -> Any:
+            return importlib.import_module("app.main").app
+
+    Application().run()
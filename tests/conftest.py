@@ -0,0 +1,59 @@
+"""Shared test configuration."""
+import os
+from collections import OrderedDict
+from typing import Any
+from typing import Callable
+from typing import Dict
+
+import pytest
+
+
+# The application settings require an Ollama URL at import time.
+os.environ.setdefault("OLLAMA_BASE_URL", "http://localhost:11434")
+
+
+@pytest.fixture(autouse=True)
+def fresh_plan_cache(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Start every test without plans cached by earlier tests."""
+    from app.services.coordination import coordinator
+    from app.services.workout import workout_service
+
+    monkeypatch.setattr(coordinator, "_cache", OrderedDict())
+    monkeypatch.setattr(workout_service, "_plans", OrderedDict())
+
+
+@pytest.fixture
+def profile() -> Dict[str, Any]:
+    """The sample user the tests plan for, as request fields."""
+    return {
+        "age": 32,
+        "height": 165,
+        "weight": 92,
+        "physical_condition": "overweight",
+        "sessions_per_week": 3,
+        "workout_time": 60,
+    }
+
+
+@pytest.fixture
+def user_profile(profile: Dict[str, Any]) -> Dict[str, Any]:
+    """The sample user as the profile section of a plan."""
+    return {
+        "age": profile["age"],
+        "weight": profile["weight"],
+        "height": profile["height"],
+        "physical_condition": profile["physical_condition"],
+        "training_frequency": profile["sessions_per_week"],
+        "workout_time_per_session": profile["workout_time"],
+    }
+
+
+@pytest.fixture
+def make_request(profile: Dict[str, Any]) -> Callable[..., Any]:
+    """Build a chat request for the sample user with some fields replaced."""
+    from app.schemas.ollama import ChatRequest
+
+    def make(**overrides: Any) -> ChatRequest:
+        return ChatRequest(**dict(profile, **overrides))
+
+    return make
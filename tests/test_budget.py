@@ -0,0 +1,131 @@
+"""Test cases for the generation budget and deadlines."""
+import asyncio
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+
+import pytest
+
+from app.core.deadline import Deadline
+from app.core.deadline import DeadlineExceeded
+from app.schemas.ollama import ChatRequest
+from app.schemas.ollama import ChatResponse
+from app.services import workout
+from app.services.agenta import agenta_service
+from app.services.budget import GenerationBudget
+from app.services.ollama import ollama_service
+from app.services.rules import rule_based_planner
+
+
+def _response(
+    eval_count: int, eval_seconds: float, done_reason: str = "stop"
+) -> ChatResponse:
+    return ChatResponse(
+        response="{}",
+        model="llama3",
+        created_at="",
+        done=True,
+        done_reason=done_reason,
+        eval_count=eval_count,
+        eval_duration=int(eval_seconds * 1e9),
+        prompt_eval_duration=int(0.5 * 1e9),
+    )
+
+
+def test_num_predict_scales_with_sessions() -> None:
+    """It budgets more tokens for more sessions and honours max_tokens."""
+    budget = GenerationBudget()
+    for _ in range(20):
+        budget.observe("llama3", _response(600, 6.0), sessions=3, workout_time=60)
+
+    three = budget.num_predict("llama3", 3, 60)
+    five = budget.num_predict("llama3", 5, 60)
+    assert three is not None and five is not None
+    assert 600 < three < five
+    assert budget.num_predict("llama3", 5, 60, max_tokens=100) == 100
+
+
+def test_num_predict_scales_with_workout_time() -> None:
+    """It fits long sessions after learning only from short ones."""
+    budget = GenerationBudget()
+    for _ in range(50):
+        budget.observe("llama3", _response(450, 4.5), sessions=3, workout_time=30)
+
+    # A valid 7 x 120 minute plan is about 3,500 tokens
+    num_predict = budget.num_predict("llama3", 7, 120)
+    assert num_predict is not None and num_predict >= 3500
+
+
+def test_truncated_outputs_raise_the_estimate() -> None:
+    """It treats an output cut off at num_predict as a lower bound."""
+    budget = GenerationBudget()
+    for _ in range(50):
+        budget.observe("llama3", _response(450, 4.5), sessions=3, workout_time=30)
+    before = budget.num_predict("llama3", 3, 30)
+    assert before is not None
+
+    budget.observe("llama3", _response(before, 9.0, "length"), 3, 30)
+
+    after = budget.num_predict("llama3", 3, 30)
+    assert after is not None and after > 1.5 * before
+
+
+def test_cut_off_generation_is_retried_with_a_larger_budget(
+    make_request: Callable[..., ChatRequest], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """It retries a truncated generation once instead of failing the tier."""
+    request = make_request(available_machines=["treadmill", "leg press"])
+    plan = rule_based_planner.build(request).model_dump_json()
+    budgets: List[Optional[int]] = []
+
+    async def messages() -> List[Dict[str, str]]:
+        return [{"role": "user", "content": "Plan"}]
+
+    async def chat(
+        messages: Any, model: str, temperature: Any, num_predict: int, **kwargs: Any
+    ) -> ChatResponse:
+        budgets.append(num_predict)
+        if len(budgets) == 1:
+            return ChatResponse(
+                response=plan[: len(plan) // 2],
+                model=model,
+                created_at="",
+                done=True,
+                done_reason="length",
+                eval_count=num_predict,
+            )
+        return ChatResponse(
+            response=plan, model=model, created_at="", done=True, eval_count=600
+        )
+
+    monkeypatch.setattr(workout, "generation_budget", GenerationBudget())
+    monkeypatch.setattr(agenta_service, "get_messages", messages)
+    monkeypatch.setattr(ollama_service, "chat_with_system", chat)
+
+    result = asyncio.run(workout.workout_service.generate_llm_plan(request))
+
+    assert result.model_dump_json() == plan
+    assert len(budgets) == 2
+    assert budgets[0] is not None and budgets[1] is not None
+    assert budgets[1] > budgets[0]
+
+
+def test_estimate_seconds_uses_observed_speed() -> None:
+    """It estimates prompt time plus tokens over observed throughput."""
+    budget = GenerationBudget()
+    assert budget.estimate_seconds("llama3", 500) is None
+    budget.observe("llama3", _response(500, 5.0), sessions=2, workout_time=60)
+    assert budget.estimate_seconds("llama3", 500) == pytest.approx(5.5)
+
+
+def test_deadline_rejects_when_spent() -> None:
+    """It raises once no budget remains."""
+    assert Deadline.from_ms(None, None) is None
+    deadline = Deadline.from_ms(5000, 1)
+    assert deadline is not None
+    asyncio.run(asyncio.sleep(0.01))
+    with pytest.raises(DeadlineExceeded) as info:
+        deadline.observe("queue")
+    assert info.value.stage == "queue"
@@ -0,0 +1,168 @@
+"""Test cases for the bulk module."""
+import asyncio
+import json
+import sys
+import types
+from pathlib import Path
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import List
+
+import pytest
+from click.testing import CliRunner
+
+from app.core.config import settings
+from app.core.shards import iter_shards
+from app.schemas.ollama import ChatRequest
+from app.schemas.ollama import UserProfile
+from app.schemas.ollama import WorkoutPlan
+from app.services.agenta import PROMPT_CACHE_KEY
+from app.services.agenta import agenta_service
+from app.services.coordination import coordinator
+from app.services.ollama import ollama_service
+from app.services.rules import rule_based_planner
+from train_ai import bulk
+from train_ai.__main__ import main
+
+
+SYSTEM = {"role": "system", "content": "You are a personal trainer."}
+
+
+def _plan(request: ChatRequest) -> WorkoutPlan:
+    profile = UserProfile(
+        age=request.age,
+        weight=request.weight,
+        height=request.height,
+        physical_condition=request.physical_condition,
+        training_frequency=request.sessions_per_week,
+        workout_time_per_session=request.workout_time,
+    )
+    return WorkoutPlan(user_profile=profile, weekly_routine=[])
+
+
+@pytest.fixture
+def write_profiles(profile: Dict[str, Any]) -> Callable[[Path, int], None]:
+    """Write numbered copies of the sample user on a rower to a JSONL file."""
+
+    def write(path: Path, count: int) -> None:
+        with open(path, "w") as handle:
+            for index in range(count):
+                row = dict(profile, id=f"p{index}", available_machines=["rower"])
+                handle.write(json.dumps(row) + "\n")
+
+    return write
+
+
+def test_read_profiles_csv(tmp_path: Path) -> None:
+    """It parses CSV rows and splits the machine list."""
+    path = tmp_path / "profiles.csv"
+    path.write_text(
+        "age,height,weight,physical_condition,sessions_per_week,"
+        "workout_time,available_machines,temperature\n"
+        "32,165,92,fit,3,60,rower; bike,\n"
+    )
+    [(key, profile)] = list(bulk.read_profiles(path))
+    assert key == "0"
+    assert profile["available_machines"] == ["rower", "bike"]
+    assert "temperature" not in profile
+    assert ChatRequest(**profile).age == 32
+
+
+def test_run_bulk_writes_shards(
+    write_profiles: Callable[[Path, int], None], tmp_path: Path
+) -> None:
+    """It writes every plan to rotated shards and checkpoints the keys."""
+    profiles = tmp_path / "profiles.jsonl"
+    write_profiles(profiles, 5)
+
+    async def generate(request: ChatRequest) -> WorkoutPlan:
+        return _plan(request)
+
+    progress = asyncio.run(
+        bulk.run_bulk(profiles, tmp_path / "out", generate, shard_size=2)
+    )
+
+    assert (progress.completed, progress.failed) == (5, 0)
+    assert len(list((tmp_path / "out").glob("plans-*.jsonl.gz"))) == 3
+    records = list(iter_shards(tmp_path / "out", "plans"))
+    assert sorted(r["id"] for r in records) == [f"p{i}" for i in range(5)]
+    checkpoint = (tmp_path / "out" / bulk.CHECKPOINT_FILE).read_text().split()
+    assert sorted(checkpoint) == [f"p{i}" for i in range(5)]
+
+
+def test_run_bulk_resumes(
+    write_profiles: Callable[[Path, int], None], tmp_path: Path
+) -> None:
+    """It retries only the profiles that did not complete."""
+    profiles = tmp_path / "profiles.jsonl"
+    write_profiles(profiles, 4)
+    seen: List[int] = []
+
+    async def flaky(request: ChatRequest) -> WorkoutPlan:
+        seen.append(request.age)
+        if len(seen) % 2:
+            raise RuntimeError("ollama unavailable")
+        return _plan(request)
+
+    first = asyncio.run(bulk.run_bulk(profiles, tmp_path / "out", flaky, concurrency=1))
+    assert (first.completed, first.failed) == (2, 2)
+
+    async def generate(request: ChatRequest) -> WorkoutPlan:
+        return _plan(request)
+
+    second = asyncio.run(bulk.run_bulk(profiles, tmp_path / "out", generate))
+    assert (second.total, second.skipped, second.completed) == (2, 2, 2)
+    records = list(iter_shards(tmp_path / "out", "plans"))
+    assert len({r["id"] for r in records}) == 4
+
+
+def test_bulk_command_generates_plans_with_the_service(
+    write_profiles: Callable[[Path, int], None],
+    make_request: Callable[..., ChatRequest],
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """It initializes Agenta and generates plans through the real service."""
+    profiles = tmp_path / "profiles.jsonl"
+    write_profiles(profiles, 2)
+    initialized: List[bool] = []
+    prompts: List[str] = []
+
+    def get_from_registry(**kwargs: Any) -> Dict[str, Any]:
+        if not initialized:
+            raise Exception("API URL and credentials must be set.")
+        user = {"role": "user", "content": "Plan for {{available_machines}}"}
+        return {"prompt": {"messages": [SYSTEM, user]}}
+
+    async def chat(endpoint: str, data: Dict[str, Any], *args: Any) -> Dict[str, Any]:
+        prompts.append(data["messages"][-1]["content"])
+        plan = rule_based_planner.build(make_request(available_machines=["rower"]))
+        return {"message": {"content": plan.model_dump_json()}, "done": True}
+
+    async def running_models() -> List[str]:
+        return []
+
+    # Stands in for the SDK, which fails the same way without init()
+    sdk = types.ModuleType("agenta")
+    sdk.init = lambda: initialized.append(True)  # type: ignore[attr-defined]
+    sdk.ConfigManager = types.SimpleNamespace(  # type: ignore[attr-defined]
+        get_from_registry=get_from_registry
+    )
+    monkeypatch.setitem(sys.modules, "agenta", sdk)
+    monkeypatch.setattr(agenta_service, "_initialized", False)
+    monkeypatch.setattr(agenta_service, "_prompt", None)
+    monkeypatch.setattr(ollama_service, "_make_request", chat)
+    monkeypatch.setattr(ollama_service, "list_running_models", running_models)
+    monkeypatch.setattr(settings, "PLAN_ROUTING", "llm")
+    asyncio.run(coordinator.cache_delete(PROMPT_CACHE_KEY))
+
+    result = CliRunner().invoke(
+        main, ["bulk", str(profiles), "--output-dir", str(tmp_path / "out")]
+    )
+
+    assert result.exit_code == 0, result.output
+    assert initialized == [True]
+    assert prompts == ["Plan for Rowing Machine"] * 2
+    records = list(iter_shards(tmp_path / "out", "plans"))
+    assert sorted(r["id"] for r in records) == ["p0", "p1"]
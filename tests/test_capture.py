@@ -0,0 +1,124 @@
+"""Test cases for generation capture and dataset export."""
+import asyncio
+import gzip
+import json
+import time
+from pathlib import Path
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import List
+
+import pytest
+from click.testing import CliRunner
+
+from app.core.config import settings
+from app.schemas.ollama import ChatRequest
+from app.schemas.ollama import ChatResponse
+from app.services.capture import CaptureService
+from app.services.capture import export_dataset
+from train_ai import __main__
+
+
+MESSAGES = [{"role": "user", "content": "Plan for rower"}]
+
+
+def _response(output: str) -> ChatResponse:
+    return ChatResponse(
+        response=output, model="llama3", created_at="", done=True, eval_count=42
+    )
+
+
+@pytest.fixture
+def record(make_request: Callable[..., ChatRequest]) -> Callable[..., None]:
+    """Record plan generations for the sample user on a rower."""
+    request = make_request(available_machines=["rower"])
+
+    def record(
+        service: CaptureService,
+        key: str,
+        output: str,
+        parsed: bool = True,
+        messages: List[Dict[str, str]] = MESSAGES,
+    ) -> None:
+        response = _response(output)
+        service.record("plan", request, key, "v1", messages, response, parsed, [])
+
+    return record
+
+
+def test_capture_and_export(
+    record: Callable[..., None], tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """It writes buffered records to shards and exports them deduplicated."""
+    monkeypatch.setattr(settings, "CAPTURE_ENABLED", True)
+    monkeypatch.setattr(settings, "CAPTURE_DIR", str(tmp_path / "captures"))
+    monkeypatch.setattr(settings, "CAPTURE_BATCH_SIZE", 2)
+    service = CaptureService()
+
+    async def capture() -> None:
+        record(service, "k", "{}")
+        await service.start()
+        record(service, "k", "{}")
+        record(service, "k", "{}")
+        record(service, "k", "{}", messages=[{"role": "user", "content": "Day"}])
+        record(service, "k", "x", parsed=False)
+        await asyncio.sleep(0.1)
+        await service.stop()
+
+    asyncio.run(capture())
+    assert not service.running
+
+    output = tmp_path / "dataset.jsonl.gz"
+    result = CliRunner().invoke(
+        __main__.main, ["export-dataset", str(tmp_path / "captures"), str(output)]
+    )
+    assert result.exit_code == 0, result.output
+    with gzip.open(output, "rt") as handle:
+        records = [json.loads(line) for line in handle]
+    # Same request and output from a different rendered prompt is kept
+    assert [r["raw_output"] for r in records] == ["{}", "{}", "x"]
+    assert records[0]["messages"] == MESSAGES
+    assert records[0]["prompt_hash"] != records[1]["prompt_hash"]
+    assert {r["format"] for r in records} == {"full"}
+    assert records[0]["eval_count"] == 42
+    assert records[0]["request"]["available_machines"] == ["rower"]
+
+    result = CliRunner().invoke(
+        __main__.main,
+        ["export-dataset", str(tmp_path / "captures"), str(output), "--valid-only"],
+    )
+    assert "Exported 2 records" in result.output
+
+
+def test_stop_waits_for_a_write_in_progress(
+    record: Callable[..., None], tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """It never writes to or closes a shard while a batch is being written."""
+    monkeypatch.setattr(settings, "CAPTURE_ENABLED", True)
+    monkeypatch.setattr(settings, "CAPTURE_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "CAPTURE_BATCH_SIZE", 1)
+    service = CaptureService()
+    writing = []
+    write = service._write
+
+    def slow_write(batch: List[Dict[str, Any]]) -> None:
+        assert not writing, "concurrent writes to one shard"
+        writing.append(True)
+        time.sleep(0.1)
+        write(batch)
+        writing.pop()
+
+    monkeypatch.setattr(service, "_write", slow_write)
+
+    async def capture() -> None:
+        await service.start()
+        record(service, "a", "{}")
+        await asyncio.sleep(0.02)
+        # The first batch is being written in its thread while we stop
+        record(service, "b", "{}")
+        await service.stop()
+
+    asyncio.run(capture())
+    keys = [record["request_key"] for record in export_dataset(tmp_path)]
+    assert keys == ["a", "b"]
@@ -0,0 +1,161 @@
+"""Test cases for the model cascade."""
+import asyncio
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import List
+
+import pytest
+
+from app.core.config import settings
+from app.schemas.ollama import ChatRequest
+from app.schemas.ollama import ChatResponse
+from app.services.agenta import agenta_service
+from app.services.ollama import ollama_service
+from app.services.rules import rule_based_planner
+from app.services.workout import workout_service
+
+
+@pytest.fixture
+def chat_request(make_request: Callable[..., ChatRequest]) -> ChatRequest:
+    """The sample user with two machines."""
+    return make_request(available_machines=["treadmill", "leg press"])
+
+
+@pytest.fixture
+def plans(chat_request: ChatRequest) -> Dict[str, str]:
+    """A plan that follows the rules and two with the wrong number of days."""
+
+    def build(sessions: int) -> str:
+        request = chat_request.model_copy(update={"sessions_per_week": sessions})
+        return rule_based_planner.build(request).model_dump_json()
+
+    return {"valid": build(3), "too many days": build(5), "too few days": build(1)}
+
+
+@pytest.fixture
+def upstream(monkeypatch: pytest.MonkeyPatch) -> Any:
+    """Replace Ollama with scripted outputs per model; record the calls."""
+    outputs: Dict[str, Any] = {}
+    calls: List[str] = []
+
+    async def messages() -> List[Dict[str, str]]:
+        return [{"role": "user", "content": "Plan for {{available_machines}}"}]
+
+    async def chat(
+        messages: Any, model: str, *args: Any, **kwargs: Any
+    ) -> ChatResponse:
+        calls.append(model)
+        output = outputs[model]
+        if isinstance(output, Exception):
+            raise output
+        return ChatResponse(response=output, model=model, created_at="", done=True)
+
+    monkeypatch.setattr(settings, "OLLAMA_MODEL_CASCADE", "small,medium,large")
+    monkeypatch.setattr(settings, "PLAN_ROUTING", "llm")
+    monkeypatch.setattr(agenta_service, "get_messages", messages)
+    monkeypatch.setattr(ollama_service, "chat_with_system", chat)
+    return outputs, calls
+
+
+def test_small_tier_is_accepted(
+    upstream: Any, chat_request: ChatRequest, plans: Dict[str, str]
+) -> None:
+    """It stops at the first tier whose plan follows the rules."""
+    outputs, calls = upstream
+    outputs.update(small=plans["valid"])
+
+    plan = asyncio.run(workout_service.generate_plan(chat_request))
+
+    assert plan.model_dump_json() == plans["valid"]
+    assert calls == ["small"]
+
+
+def test_invalid_output_moves_up_a_tier(
+    upstream: Any, chat_request: ChatRequest, plans: Dict[str, str]
+) -> None:
+    """It escalates on unparseable output and on rule violations."""
+    outputs, calls = upstream
+    outputs.update(
+        small="not json", medium=plans["too many days"], large=plans["valid"]
+    )
+
+    plan = asyncio.run(workout_service.generate_plan(chat_request))
+
+    assert plan.model_dump_json() == plans["valid"]
+    assert calls == ["small", "medium", "large"]
+
+
+def test_missing_days_move_up_a_tier(
+    upstream: Any, chat_request: ChatRequest, plans: Dict[str, str]
+) -> None:
+    """It does not accept a plan with fewer days than sessions."""
+    outputs, calls = upstream
+    outputs.update(small=plans["too few days"], medium=plans["valid"])
+
+    plan = asyncio.run(workout_service.generate_plan(chat_request))
+
+    assert plan.model_dump_json() == plans["valid"]
+    assert calls == ["small", "medium"]
+
+
+def test_every_tier_failing_returns_the_fallback(
+    upstream: Any, chat_request: ChatRequest, plans: Dict[str, str]
+) -> None:
+    """It returns the last rule-breaking plan when no tier gets it right."""
+    outputs, calls = upstream
+    outputs.update(
+        small=plans["too many days"], medium="{}", large=plans["too many days"]
+    )
+
+    plan = asyncio.run(workout_service.generate_plan(chat_request))
+
+    assert plan.model_dump_json() == plans["too many days"]
+    assert calls == ["small", "medium", "large"]
+
+
+def test_upstream_errors_do_not_move_up(
+    upstream: Any, chat_request: ChatRequest, plans: Dict[str, str]
+) -> None:
+    """It raises transport errors instead of trying the next tier."""
+    outputs, calls = upstream
+    outputs.update(
+        small=Exception("Failed to connect to Ollama"), medium=plans["valid"]
+    )
+
+    with pytest.raises(Exception, match="Failed to connect"):
+        asyncio.run(workout_service.generate_plan(chat_request))
+    assert calls == ["small"]
+
+
+def test_llm_plans_are_served_from_the_shared_cache(
+    upstream: Any, chat_request: ChatRequest, plans: Dict[str, str]
+) -> None:
+    """It generates a profile's plan once and reuses it across workers."""
+    outputs, calls = upstream
+    outputs.update(small=plans["valid"])
+
+    first = asyncio.run(workout_service.generate_plan(chat_request))
+    # Another worker only shares the coordinator cache
+    workout_service._plans.clear()
+    second = asyncio.run(workout_service.generate_plan(chat_request))
+
+    assert first == second
+    assert calls == ["small"]
+
+
+def test_rule_breaking_plans_are_not_cached(
+    upstream: Any, chat_request: ChatRequest, plans: Dict[str, str]
+) -> None:
+    """It generates again when the last plan had to be a fallback."""
+    outputs, calls = upstream
+    outputs.update(
+        small=plans["too many days"],
+        medium=plans["too many days"],
+        large=plans["too many days"],
+    )
+
+    asyncio.run(workout_service.generate_plan(chat_request))
+    asyncio.run(workout_service.generate_plan(chat_request))
+
+    assert calls == ["small", "medium", "large"] * 2
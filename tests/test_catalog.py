@@ -0,0 +1,48 @@
+"""Test cases for the exercise catalog."""
+from pathlib import Path
+
+from app.services.catalog import ExerciseCatalog
+
+
+def test_resolve_free_text_machines() -> None:
+    """It maps misspelt and reordered names to canonical machines."""
+    catalog = ExerciseCatalog()
+    matches = catalog.resolve(["leg standing curl", "treadmil", "spaceship"])
+    assert [m.machine for m in matches] == ["Standing Leg Curl", "Treadmill", None]
+    assert matches[2].name == "spaceship"
+
+
+def test_unknown_equipment_is_kept_as_given() -> None:
+    """It does not force near-miss names onto a different machine."""
+    catalog = ExerciseCatalog()
+    names = ["jump rope", "boxing", "sled", "bosu ball"]
+    matches = catalog.resolve(names)
+    assert [m.machine for m in matches] == [None] * len(names)
+    assert [m.name for m in matches] == names
+
+
+def test_ambiguous_names_are_not_resolved() -> None:
+    """It leaves names that fit several machines equally well unresolved."""
+    catalog = ExerciseCatalog()
+    matches = catalog.resolve(["leg curl", "seated leg curl"])
+    assert [m.machine for m in matches] == [None, "Seated Leg Curl"]
+
+
+def test_shortlist_is_compact() -> None:
+    """It lists a bounded number of exercises per resolved machine."""
+    catalog = ExerciseCatalog()
+    shortlist = catalog.shortlist(catalog.resolve(["dumbbells", "db"]), size=2)
+    assert list(shortlist) == ["Dumbbells"]
+    assert len(shortlist["Dumbbells"]) == 2
+    assert catalog.format_shortlist(shortlist).startswith("Dumbbells: ")
+
+
+def test_persisted_index_is_reused(tmp_path: Path) -> None:
+    """It saves the fitted index and loads it back instead of refitting."""
+    index_path = tmp_path / "index.joblib"
+    ExerciseCatalog(index_path=str(index_path)).load()
+    assert index_path.exists()
+
+    catalog = ExerciseCatalog(index_path=str(index_path))
+    catalog.load()
+    assert catalog.resolve(["rowing machine"])[0].machine == "Rowing Machine"
@@ -0,0 +1,152 @@
+"""Test cases for the compact generation format."""
+import asyncio
+import json
+from pathlib import Path
+from typing import Any
+from typing import Dict
+from typing import List
+
+import pytest
+
+from app.core.config import settings
+from app.schemas.compact import CompactDay
+from app.schemas.compact import CompactPlan
+from app.schemas.ollama import ChatRequest
+from app.schemas.ollama import ChatResponse
+from app.schemas.ollama import WorkoutDay
+from app.schemas.ollama import WorkoutPlan
+from app.services.agenta import agenta_service
+from app.services.budget import GenerationBudget
+from app.services.capture import capture_service
+from app.services.ollama import ollama_service
+from app.services.rules import rule_based_planner
+from app.services.workout import workout_service
+from train_ai.benchmark import run_benchmark
+
+
+def _request(**overrides: Any) -> ChatRequest:
+    fields = {
+        "age": 41,
+        "height": 178,
+        "weight": 80,
+        "physical_condition": "average",
+        "sessions_per_week": 4,
+        "workout_time": 60,
+        "available_machines": ["treadmill", "leg press", "dumbbells"],
+    }
+    fields.update(overrides)
+    return ChatRequest(**fields)
+
+
+@pytest.mark.parametrize(
+    "overrides",
+    [
+        {},
+        {"sessions_per_week": 7, "workout_time": 20},
+        {"physical_condition": "athletic"},
+    ],
+)
+def test_compact_plan_round_trip(overrides: Any) -> None:
+    """It expands a compact plan back into the identical public plan."""
+    request = _request(**overrides)
+    plan = rule_based_planner.build(request)
+
+    compact = CompactPlan.from_plan(plan)
+    output = json.dumps(compact.model_dump(), separators=(",", ":"))
+
+    assert workout_service.parse_result(WorkoutPlan, output, request, True) == plan
+    assert len(output) < len(json.dumps(plan.model_dump(), separators=(",", ":")))
+
+
+def test_compact_schema_restricts_machines_and_day() -> None:
+    """It keeps the machine and day restrictions on the short keys."""
+    request = _request()
+
+    schema = workout_service.plan_schema(
+        request, WorkoutDay, day="Monday", compact=True
+    )
+
+    assert schema["properties"]["d"]["enum"] == ["Monday"]
+    machines = schema["$defs"]["CompactExercise"]["properties"]["m"]["enum"]
+    assert "Treadmill" in machines
+    assert "user_profile" not in json.dumps(schema)
+
+
+def test_compact_day_expands() -> None:
+    """It parses a compact day into a public workout day."""
+    output = (
+        '{"d":"Friday","x":[{"m":"Treadmill","n":"Walk","s":1,"r":1,"t":20,"i":"L"}]}'
+    )
+
+    day = workout_service.parse_result(WorkoutDay, output, _request(), True)
+
+    assert day == CompactDay.model_validate_json(output).expand()
+    assert day.exercises[0].intensity == "Low"
+
+
+def test_benchmark_counts_upstream_errors(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """It records failed generations instead of aborting the benchmark."""
+    request = _request()
+    full = rule_based_planner.build(request)
+    compact = CompactPlan.from_plan(full)
+    budgets: List[int] = []
+
+    async def messages() -> List[Dict[str, str]]:
+        return [{"role": "user", "content": "Plan"}]
+
+    async def chat(messages: Any, **kwargs: Any) -> ChatResponse:
+        budgets.append(kwargs["max_tokens"])
+        if "CompactDay" in kwargs["format_schema"]["$defs"]:
+            raise Exception("Ollama API error: 500")
+        return ChatResponse(
+            response=full.model_dump_json(),
+            model="llama3",
+            created_at="",
+            done=True,
+            prompt_eval_count=100,
+            eval_count=len(compact.model_dump_json()),
+        )
+
+    monkeypatch.setattr(agenta_service, "get_messages", messages)
+    monkeypatch.setattr(ollama_service, "chat_with_system", chat)
+    profiles = tmp_path / "profiles.jsonl"
+    profiles.write_text(request.model_dump_json(exclude_none=True) + "\n")
+
+    summaries = asyncio.run(run_benchmark(profiles, runs=2))
+
+    assert [(s["schema"], s["runs"], s["failures"]) for s in summaries] == [
+        ("full", 2, 0),
+        ("compact", 0, 2),
+    ]
+    assert summaries[0]["prompt_tokens"] == 100
+    # Both schemas start from the production budget of a fresh worker
+    assert budgets[:2] == [GenerationBudget().num_predict("llama3", 4, 60)] * 2
+
+
+def test_captures_record_the_output_format(monkeypatch: pytest.MonkeyPatch) -> None:
+    """It tags captured generations with the schema they were made with."""
+    request = _request()
+    compact = CompactPlan.from_plan(rule_based_planner.build(request))
+    output = json.dumps(compact.model_dump())
+    formats: List[str] = []
+
+    async def messages() -> List[Dict[str, str]]:
+        return [{"role": "user", "content": "Plan"}]
+
+    async def chat(messages: Any, *args: Any, **kwargs: Any) -> ChatResponse:
+        return ChatResponse(response=output, model="llama3", created_at="", done=True)
+
+    monkeypatch.setattr(settings, "OLLAMA_COMPACT_SCHEMA", True)
+    monkeypatch.setattr(agenta_service, "get_messages", messages)
+    monkeypatch.setattr(ollama_service, "chat_with_system", chat)
+    monkeypatch.setattr(capture_service, "_task", object())
+    monkeypatch.setattr(
+        capture_service, "record", lambda *args: formats.append(args[-1])
+    )
+
+    plan = asyncio.run(workout_service.generate_llm_plan(request))
+
+    assert plan == rule_based_planner.build(request)
+    assert formats == ["compact"]
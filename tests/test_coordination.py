@@ -0,0 +1,216 @@
+"""Test cases for cross-worker coordination, using real worker processes."""
+import asyncio
+import multiprocessing
+import os
+import time
+from pathlib import Path
+from typing import Any
+from typing import Callable
+from typing import List
+
+import pytest
+
+from app.core.deadline import Deadline
+from app.core.deadline import DeadlineExceeded
+from app.services.coordination import Coordinator
+from app.services.coordination import LocalCoordinator
+from app.services.coordination import RedisCoordinator
+
+
+WORKERS = 4
+CAPACITY = 2
+
+BACKENDS = ["local"]
+if os.environ.get("COORDINATION_TEST_REDIS_URL"):
+    BACKENDS.append("redis")
+
+
+def _coordinator(backend: str, location: str) -> Coordinator:
+    if backend == "local":
+        return LocalCoordinator(CAPACITY, Path(location))
+    return RedisCoordinator(
+        CAPACITY, os.environ["COORDINATION_TEST_REDIS_URL"], location, lease=60
+    )
+
+
+@pytest.fixture(params=BACKENDS)
+def shared(request: pytest.FixtureRequest, tmp_path: Path) -> Any:
+    """Backend name and a location that no other test shares."""
+    if request.param == "local":
+        return request.param, str(tmp_path)
+    return request.param, f"train-ai-test-{os.getpid()}-{time.monotonic_ns()}"
+
+
+def _worker(
+    backend: str, location: str, start: Any, active: Any, peak: Any, results: Any
+) -> None:
+    """Hold slots, count and race for a claim like a gunicorn worker would."""
+
+    async def work() -> None:
+        coordinator = _coordinator(backend, location)
+        start.wait(timeout=30)
+        for _ in range(3):
+            async with coordinator.slot("llama3:latest"):
+                with active.get_lock():
+                    active.value += 1
+                    peak.value = max(peak.value, active.value)
+                await asyncio.sleep(0.05)
+                with active.get_lock():
+                    active.value -= 1
+            coordinator.incr("requests")
+        await coordinator.cache_set(f"plan:{os.getpid()}", str(os.getpid()), 60)
+        claimed = await coordinator.cache_add("refining:same", str(os.getpid()), 60)
+        results.put(claimed)
+        await coordinator.close()
+
+    asyncio.run(work())
+
+
+def _hold_slot_and_die(backend: str, location: str) -> None:
+    """Take a slot and exit without releasing it."""
+
+    async def work() -> None:
+        await _coordinator(backend, location)._wait_for_slot(
+            "llama3:latest", False, None
+        )
+
+    asyncio.run(work())
+    os._exit(0)
+
+
+def _run_model(
+    backend: str,
+    location: str,
+    model: str,
+    resident: bool,
+    after: Any,
+    holding: Any,
+    spans: Any,
+) -> None:
+    """Run one request for ``model`` and report when it held the slot."""
+
+    async def work() -> None:
+        coordinator = _coordinator(backend, location)
+        if after is not None:
+            await asyncio.to_thread(after.wait, 30)
+        async with coordinator.slot(model, resident):
+            started = time.monotonic()
+            holding.set()
+            await asyncio.sleep(0.3)
+        spans.put((model, started, time.monotonic()))
+        await coordinator.close()
+
+    asyncio.run(work())
+
+
+def _run_processes(target: Callable[..., None], count: int, *args: Any) -> List[Any]:
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=target, args=args) for _ in range(count)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(timeout=60)
+        assert process.exitcode == 0
+    return processes
+
+
+def test_workers_share_slots_cache_and_counters(shared: Any) -> None:
+    """It enforces one global limit and aggregates state over processes."""
+    backend, location = shared
+    context = multiprocessing.get_context("spawn")
+    start = context.Barrier(WORKERS)
+    active, peak = context.Value("i", 0), context.Value("i", 0)
+    results = context.Queue()
+
+    processes = _run_processes(
+        _worker, WORKERS, backend, location, start, active, peak, results
+    )
+
+    assert peak.value == CAPACITY
+    claims = [results.get(timeout=5) for _ in processes]
+    assert claims.count(True) == 1
+
+    async def check() -> None:
+        coordinator = _coordinator(backend, location)
+        stats = await coordinator.stats()
+        assert stats["counters"]["requests"] == WORKERS * 3
+        assert stats["in_flight"] == 0
+        for process in processes:
+            assert await coordinator.cache_get(f"plan:{process.pid}") == str(
+                process.pid
+            )
+        await coordinator.close()
+
+    asyncio.run(check())
+
+
+@pytest.mark.parametrize("resident", [False, True])
+def test_cold_models_wait_for_other_workers(shared: Any, resident: bool) -> None:
+    """It keeps a cold model from loading while another worker runs a model."""
+    backend, location = shared
+    context = multiprocessing.get_context("spawn")
+    small_holding, big_holding = context.Event(), context.Event()
+    spans = context.Queue()
+    processes = [
+        context.Process(
+            target=_run_model,
+            args=(backend, location, "small", True, None, small_holding, spans),
+        ),
+        context.Process(
+            target=_run_model,
+            args=(
+                backend,
+                location,
+                "big",
+                resident,
+                small_holding,
+                big_holding,
+                spans,
+            ),
+        ),
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(timeout=60)
+        assert process.exitcode == 0
+
+    held = {
+        model: (start, end)
+        for model, start, end in (spans.get(timeout=5) for _ in processes)
+    }
+    assert (held["big"][0] < held["small"][1]) == resident
+
+
+def test_slots_of_exited_workers_are_reclaimed(tmp_path: Path) -> None:
+    """It frees slots held by worker processes that died."""
+    _run_processes(_hold_slot_and_die, CAPACITY, "local", str(tmp_path))
+
+    async def check() -> None:
+        coordinator = _coordinator("local", str(tmp_path))
+        tokens = [
+            await coordinator._wait_for_slot("llama3:latest", False, Deadline(5))
+            for _ in range(CAPACITY)
+        ]
+        assert coordinator.saturated
+        with pytest.raises(DeadlineExceeded):
+            await coordinator._wait_for_slot("llama3:latest", True, Deadline(0.05))
+        for token in tokens:
+            await coordinator._release(token)
+
+    asyncio.run(check())
+
+
+def test_process_cache_expires_entries() -> None:
+    """It forgets cached values after their TTL."""
+
+    async def scenario() -> None:
+        coordinator = Coordinator(CAPACITY, cache_size=2)
+        await coordinator.cache_set("a", "1", ttl=0.01)
+        await coordinator.cache_set("b", "2", ttl=60)
+        await asyncio.sleep(0.02)
+        assert await coordinator.cache_get("a") is None
+        assert await coordinator.cache_add("b", "3", ttl=60) is False
+        assert await coordinator.cache_get("b") == "2"
+
+    asyncio.run(scenario())
@@ -0,0 +1,197 @@
+"""Test cases for incremental plan edits."""
+import asyncio
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import List
+
+import pytest
+
+from app.core.config import settings
+from app.core.deadline import DeadlineExceeded
+from app.schemas.ollama import ChatRequest
+from app.schemas.ollama import Exercise
+from app.schemas.ollama import PlanEditRequest
+from app.schemas.ollama import WorkoutDay
+from app.schemas.ollama import WorkoutPlan
+from app.services.agenta import agenta_service
+from app.services.workout import workout_service
+
+
+@pytest.fixture
+def plan(user_profile: Dict[str, Any]) -> Dict[str, Any]:
+    """A three-day plan for the sample user on a rower and a leg press."""
+    return {
+        "user_profile": user_profile,
+        "weekly_routine": [
+            {
+                "day": day,
+                "exercises": [
+                    {
+                        "machine": machine,
+                        "exercise_name": "Exercise",
+                        "sets": 3,
+                        "reps": 10,
+                        "duration_minutes": minutes,
+                        "intensity": "Medium",
+                    }
+                ],
+            }
+            for day, machine, minutes in [
+                ("Monday", "rower", 50),
+                ("Wednesday", "Leg Press", 30),
+                ("Friday", "rower", 30),
+            ]
+        ],
+    }
+
+
+@pytest.fixture
+def edit(plan: Dict[str, Any]) -> Callable[..., PlanEditRequest]:
+    """Build an edit of the sample plan."""
+
+    def make(**changes: Any) -> PlanEditRequest:
+        return PlanEditRequest(
+            plan=plan, available_machines=["rower", "leg press"], **changes
+        )
+
+    return make
+
+
+def test_removed_machine_affects_days_using_it(
+    edit: Callable[..., PlanEditRequest]
+) -> None:
+    """It matches removed machines by their canonical names."""
+    assert workout_service.affected_days(edit(remove_machines=["leg press"])) == [1]
+    assert workout_service.affected_days(edit(remove_machines=["rowing machine"])) == [
+        0,
+        2,
+    ]
+
+
+def test_workout_time_changes(edit: Callable[..., PlanEditRequest]) -> None:
+    """It regenerates over-long days, every day, or just the edited day."""
+    assert workout_service.affected_days(edit(workout_time=40)) == [0]
+    assert workout_service.affected_days(edit(workout_time=90)) == [0, 1, 2]
+    assert workout_service.affected_days(edit(workout_time=20, day="friday")) == [2]
+    assert workout_service.affected_days(edit(add_machines=["bike"])) == []
+
+
+@pytest.fixture
+def cascade(monkeypatch: pytest.MonkeyPatch) -> List[Dict[str, Any]]:
+    """Replace the model cascade with one returning a fixed day."""
+    calls: List[Dict[str, Any]] = []
+
+    async def messages() -> List[Dict[str, str]]:
+        return [{"role": "system", "content": "You are a coach."}]
+
+    async def fake_cascade(
+        request: ChatRequest, messages: Any, schema: Any, *args: Any
+    ) -> WorkoutDay:
+        calls.append({"request": request, "messages": messages, "schema": schema})
+        exercise = Exercise(
+            machine="Rowing Machine",
+            exercise_name="New",
+            sets=1,
+            reps=1,
+            duration_minutes=15,
+            intensity="Low",
+        )
+        # The model may name the day differently; edit_plan pins it back
+        return WorkoutDay(day="Someday", exercises=[exercise])
+
+    monkeypatch.setattr(settings, "PLAN_ROUTING", "llm")
+    monkeypatch.setattr(agenta_service, "get_messages", messages)
+    monkeypatch.setattr(workout_service, "_cascade", fake_cascade)
+    return calls
+
+
+def test_edit_plan_merges_regenerated_days(
+    plan: Dict[str, Any],
+    edit: Callable[..., PlanEditRequest],
+    cascade: List[Dict[str, Any]],
+) -> None:
+    """It regenerates affected days only and keeps the others in place."""
+    result = asyncio.run(workout_service.edit_plan(edit(remove_machines=["rower"])))
+
+    routine = result.plan.weekly_routine
+    assert [d.day for d in routine] == ["Monday", "Wednesday", "Friday"]
+    assert routine[1] == WorkoutPlan(**plan).weekly_routine[1]
+    for position in (0, 2):
+        assert routine[position].exercises[0].exercise_name == "New"
+    assert (result.reused_days, result.regenerated_days) == (1, 2)
+    assert result.regenerated == ["Monday", "Friday"]
+
+    assert sorted(c["schema"]["properties"]["day"]["enum"][0] for c in cascade) == [
+        "Friday",
+        "Monday",
+    ]
+    assert all(c["messages"][0]["role"] == "system" for c in cascade)
+
+
+def test_edit_plan_overrides_one_day(
+    edit: Callable[..., PlanEditRequest], cascade: List[Dict[str, Any]]
+) -> None:
+    """It applies a per-day workout_time to that day only."""
+    result = asyncio.run(
+        workout_service.edit_plan(edit(workout_time=20, day="wednesday"))
+    )
+
+    [call] = cascade
+    assert call["request"].workout_time == 20
+    assert call["schema"]["properties"]["day"]["enum"] == ["Wednesday"]
+    assert result.regenerated == ["Wednesday"]
+    assert result.plan.user_profile.workout_time_per_session == 60
+
+
+def test_edit_plan_uses_rules_when_forced(
+    edit: Callable[..., PlanEditRequest],
+    cascade: List[Dict[str, Any]],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """It regenerates days without the LLM when the rules route is forced."""
+    monkeypatch.setattr(settings, "PLAN_ROUTING", "rules")
+
+    result = asyncio.run(workout_service.edit_plan(edit(remove_machines=["rower"])))
+
+    assert cascade == []
+    assert result.regenerated == ["Monday", "Friday"]
+    for position in (0, 2):
+        day = result.plan.weekly_routine[position]
+        assert {e.machine for e in day.exercises} == {"Leg Press"}
+        assert sum(e.duration_minutes for e in day.exercises) <= 60
+
+
+def test_failed_day_cancels_the_others(
+    edit: Callable[..., PlanEditRequest], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """It stops regenerating other days once one of them fails."""
+    cancelled: List[str] = []
+
+    async def messages() -> List[Dict[str, str]]:
+        return [{"role": "system", "content": "You are a coach."}]
+
+    async def fake_cascade(
+        request: ChatRequest, messages: Any, schema: Any, *args: Any
+    ) -> WorkoutDay:
+        day = schema["properties"]["day"]["enum"][0]
+        if day == "Monday":
+            raise DeadlineExceeded("upstream")
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(day)
+            raise
+        raise AssertionError(f"{day} was not cancelled")
+
+    monkeypatch.setattr(settings, "PLAN_ROUTING", "llm")
+    monkeypatch.setattr(agenta_service, "get_messages", messages)
+    monkeypatch.setattr(workout_service, "_cascade", fake_cascade)
+
+    async def scenario() -> None:
+        with pytest.raises(DeadlineExceeded):
+            await workout_service.edit_plan(edit(remove_machines=["rower"]))
+        # Cancelled before the error reached the caller, not at loop shutdown
+        assert cancelled == ["Friday"]
+
+    asyncio.run(scenario())
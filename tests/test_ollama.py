@@ -0,0 +1,74 @@
+"""Test cases for the Ollama client."""
+import asyncio
+import time
+from typing import Any
+from typing import Awaitable
+from typing import Callable
+from typing import List
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import unused_port
+
+from app.services.ollama import OllamaService
+
+
+def _serve(
+    handler: Callable[[web.Request], Awaitable[web.Response]],
+    scenario: Callable[[OllamaService], Awaitable[Any]],
+) -> Any:
+    """Run ``scenario`` against a local server answering with ``handler``."""
+
+    async def run() -> Any:
+        app = web.Application()
+        app.router.add_route("*", "/{tail:.*}", handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        port = unused_port()
+        await web.TCPSite(runner, "127.0.0.1", port).start()
+        service = OllamaService()
+        service.base_url = f"http://127.0.0.1:{port}"
+        service.max_retries = 3
+        try:
+            return await scenario(service)
+        finally:
+            await runner.cleanup()
+
+    return asyncio.run(run())
+
+
+def test_health_check_does_not_retry() -> None:
+    """It reports an unhealthy server after a single attempt."""
+    hits: List[str] = []
+
+    async def failing(request: web.Request) -> web.Response:
+        hits.append(request.path)
+        return web.Response(status=500, text="down")
+
+    async def scenario(service: OllamaService) -> bool:
+        return await service.health_check()
+
+    assert _serve(failing, scenario) is False
+    assert hits == ["/api/tags"]
+
+
+def test_chat_retries_within_one_timeout() -> None:
+    """It retries server errors but spends at most OLLAMA_TIMEOUT in total."""
+    hits: List[str] = []
+
+    async def slow_failing(request: web.Request) -> web.Response:
+        hits.append(request.path)
+        await asyncio.sleep(0.2)
+        return web.Response(status=500, text="overloaded")
+
+    async def scenario(service: OllamaService) -> float:
+        service.timeout = 1
+        started = time.monotonic()
+        with pytest.raises(Exception, match="Ollama API error: 500"):
+            await service._make_request("api/chat", {}, retries=service.max_retries)
+        return time.monotonic() - started
+
+    elapsed = _serve(slow_failing, scenario)
+
+    assert 1 < len(hits) <= 1 + 3
+    assert elapsed < 1.2
@@ -0,0 +1,120 @@
+"""Test cases for the rule-based planner and plan routing."""
+import asyncio
+import functools
+from typing import Any
+from typing import Callable
+from typing import List
+
+import pytest
+from pydantic import ValidationError
+
+from app.core.config import Settings
+from app.core.config import settings
+from app.schemas.ollama import ChatRequest
+from app.schemas.ollama import WorkoutPlan
+from app.services.routing import Route
+from app.services.routing import routing_policy
+from app.services.rules import rule_based_planner
+from app.services.validation import plan_violations
+from app.services.workout import workout_service
+
+
+@pytest.fixture
+def make_request(
+    make_request: Callable[..., ChatRequest]
+) -> Callable[..., ChatRequest]:
+    """Default to long sessions on machines the rules know well."""
+    return functools.partial(
+        make_request,
+        workout_time=90,
+        available_machines=["rear kick", "hip trust", "leg standing curl"],
+    )
+
+
+@pytest.mark.parametrize(
+    "overrides",
+    [
+        {},
+        {"sessions_per_week": 7, "workout_time": 20},
+        {"available_machines": ["treadmill", "rower"], "workout_time": 75},
+        {"available_machines": ["dumbbells", "bike"], "physical_condition": "athletic"},
+        {"sessions_per_week": 1, "workout_time": 3},
+    ],
+)
+def test_rule_based_plans_pass_validation(
+    overrides: Any, make_request: Callable[..., ChatRequest]
+) -> None:
+    """It builds schema-valid plans that follow the plan rules."""
+    request = make_request(**overrides)
+    plan = rule_based_planner.build(request)
+
+    assert WorkoutPlan.model_validate(plan.model_dump()) == plan
+    assert len(plan.weekly_routine) == request.sessions_per_week
+    assert plan_violations(plan, request) == []
+
+
+def test_rule_based_plan_is_deterministic(
+    make_request: Callable[..., ChatRequest]
+) -> None:
+    """It returns the same plan for the same request."""
+    assert rule_based_planner.build(make_request()) == rule_based_planner.build(
+        make_request()
+    )
+
+
+def test_auto_routing(
+    make_request: Callable[..., ChatRequest], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """It keeps non-standard profiles and explicit models on the LLM."""
+    monkeypatch.setattr(settings, "PLAN_ROUTING", "auto")
+
+    assert routing_policy.route(make_request()) is Route.RULES_THEN_LLM
+    assert routing_policy.route(make_request(model="llama3")) is Route.LLM
+    assert (
+        routing_policy.route(make_request(physical_condition="knee surgery"))
+        is Route.LLM
+    )
+    assert (
+        routing_policy.route(make_request(available_machines=["spaceship"]))
+        is Route.LLM
+    )
+
+
+def test_forced_rules_fall_back_to_llm(
+    make_request: Callable[..., ChatRequest], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """It sends profiles the rules cannot serve to the LLM."""
+    monkeypatch.setattr(settings, "PLAN_ROUTING", "rules")
+
+    assert routing_policy.route(make_request()) is Route.RULES
+    assert (
+        routing_policy.route(make_request(available_machines=["spaceship"]))
+        is Route.LLM
+    )
+
+
+def test_invalid_routing_is_rejected_at_load() -> None:
+    """It refuses an unknown PLAN_ROUTING when settings load."""
+    with pytest.raises(ValidationError):
+        Settings(PLAN_ROUTING="rule")
+
+
+def test_rule_breaking_plan_falls_back_to_llm(
+    make_request: Callable[..., ChatRequest], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """It never returns a rule-based plan that breaks the plan rules."""
+    request = make_request()
+    too_long = rule_based_planner.build(make_request(sessions_per_week=5))
+    llm_plan = rule_based_planner.build(request)
+    llm_requests: List[ChatRequest] = []
+
+    async def generate_llm_plan(request: ChatRequest, deadline: Any) -> WorkoutPlan:
+        llm_requests.append(request)
+        return llm_plan
+
+    monkeypatch.setattr(settings, "PLAN_ROUTING", "rules")
+    monkeypatch.setattr(rule_based_planner, "build", lambda request: too_long)
+    monkeypatch.setattr(workout_service, "generate_llm_plan", generate_llm_plan)
+
+    assert asyncio.run(workout_service.generate_plan(request)) is llm_plan
+    assert llm_requests == [request]
@@ -0,0 +1,91 @@
+"""Test cases for the model-aware scheduler."""
+import asyncio
+import time
+from typing import List
+
+import pytest
+
+from app.core.deadline import Deadline
+from app.core.deadline import DeadlineExceeded
+from app.services.scheduler import ModelScheduler
+
+
+async def _run(scheduler: ModelScheduler, models: List[str]) -> List[str]:
+    """Submit requests in order and return the order they were served in."""
+    served: List[str] = []
+
+    async def request(model: str) -> None:
+        await scheduler.acquire(model)
+        served.append(model)
+        await asyncio.sleep(0)
+        scheduler.release(model)
+
+    # Occupy the single slot so every request below has to queue
+    await scheduler.acquire("warmup")
+    tasks = [asyncio.create_task(request(m)) for m in models]
+    await asyncio.sleep(0)
+    scheduler.release("warmup")
+    await asyncio.gather(*tasks)
+    return served
+
+
+def test_groups_requests_by_resident_model() -> None:
+    """It drains the resident model before loading another one."""
+
+    async def resident() -> List[str]:
+        return ["small:latest", "warmup:latest"]
+
+    scheduler = ModelScheduler(1, max_batch=10, max_wait=60, fetch_resident=resident)
+    served = asyncio.run(_run(scheduler, ["big", "small", "big", "small", "small"]))
+    assert served == ["small", "small", "small", "big", "big"]
+
+
+def test_max_batch_limits_streaks() -> None:
+    """It moves on to other models after max_batch dispatches."""
+
+    async def resident() -> List[str]:
+        return ["small:latest", "warmup:latest"]
+
+    scheduler = ModelScheduler(1, max_batch=2, max_wait=60, fetch_resident=resident)
+    served = asyncio.run(_run(scheduler, ["big", "small", "small", "small", "small"]))
+    assert served[:3] == ["small", "small", "big"]
+
+
+def test_queue_wait_respects_deadline() -> None:
+    """It gives up waiting for a slot when the deadline passes."""
+
+    async def scenario() -> None:
+        scheduler = ModelScheduler(1, max_batch=8, max_wait=60)
+        await scheduler.acquire("llama3")
+        with pytest.raises(DeadlineExceeded):
+            await scheduler.acquire("llama3", Deadline(0.01))
+        scheduler.release("llama3")
+        assert scheduler.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+def test_expired_deadline_does_not_leak_a_slot() -> None:
+    """It never grants a slot to a request whose deadline ran out."""
+
+    async def slow_resident() -> List[str]:
+        await asyncio.sleep(1)
+        return []
+
+    async def scenario() -> None:
+        scheduler = ModelScheduler(
+            1, max_batch=8, max_wait=60, fetch_resident=slow_resident
+        )
+        started = time.monotonic()
+        with pytest.raises(DeadlineExceeded):
+            await scheduler.acquire("llama3", Deadline(0.02))
+        # The api/ps lookup is cut short by the deadline
+        assert time.monotonic() - started < 0.5
+        assert scheduler.in_flight == 0
+        assert not scheduler._queues
+
+        await scheduler.acquire("llama3")
+        scheduler.release("llama3")
+        assert scheduler.in_flight == 0
+
+    asyncio.run(scenario())
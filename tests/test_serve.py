@@ -0,0 +1,55 @@
+"""Test cases for the serve command."""
+from typing import Any
+from typing import List
+
+import pytest
+from click.testing import CliRunner
+
+from train_ai import __main__
+from train_ai import serve
+
+
+def test_default_workers() -> None:
+    """It sizes the worker pool from the available CPUs."""
+    assert serve.default_workers() >= 1
+
+
+def test_serve_reports_preload_breakdown(monkeypatch: pytest.MonkeyPatch) -> None:
+    """It preloads the app and reports each step before starting workers."""
+    calls: List[Any] = []
+    monkeypatch.setattr(serve, "can_preload", lambda: True)
+    monkeypatch.setattr(serve, "preload", lambda: {"fastapi": 0.5, "app": 0.25})
+    monkeypatch.setattr(serve, "run", lambda *args: calls.append(args))
+
+    result = CliRunner().invoke(__main__.main, ["serve", "--workers", "3"])
+
+    assert result.exit_code == 0, result.output
+    assert "Preloaded in 0.750s: fastapi 0.500s, app 0.250s" in result.output
+    assert calls == [("0.0.0.0", 8000, 3, True)]
+
+
+def test_serve_without_preload(monkeypatch: pytest.MonkeyPatch) -> None:
+    """It leaves importing the app to the workers."""
+    calls: List[Any] = []
+    monkeypatch.setattr(serve, "run", lambda *args: calls.append(args))
+
+    result = CliRunner().invoke(__main__.main, ["serve", "--no-preload", "-w", "1"])
+
+    assert result.exit_code == 0, result.output
+    assert "Preloaded" not in result.output
+    assert calls == [("0.0.0.0", 8000, 1, False)]
+
+
+def test_serve_skips_preload_without_gunicorn(monkeypatch: pytest.MonkeyPatch) -> None:
+    """It does not preload for uvicorn workers, which re-import the app."""
+    calls: List[Any] = []
+    monkeypatch.setattr(serve, "can_preload", lambda: False)
+    monkeypatch.setattr(serve, "preload", lambda: pytest.fail("preloaded"))
+    monkeypatch.setattr(serve, "run", lambda *args: calls.append(args))
+
+    result = CliRunner().invoke(__main__.main, ["serve", "-w", "2"])
+
+    assert result.exit_code == 0, result.output
+    assert "not preloaded" in result.output
+    assert "Preloaded" not in result.output
+    assert calls == [("0.0.0.0", 8000, 2, False)]
@@ -0,0 +1,82 @@
+"""Test cases for the plan rule checks."""
+from typing import Any
+from typing import Callable
+from typing import Dict
+
+import pytest
+
+from app.schemas.ollama import ChatRequest
+from app.schemas.ollama import Exercise
+from app.schemas.ollama import UserProfile
+from app.schemas.ollama import WorkoutDay
+from app.schemas.ollama import WorkoutPlan
+from app.services.validation import plan_violations
+
+
+@pytest.fixture
+def chat_request(make_request: Callable[..., ChatRequest]) -> ChatRequest:
+    """The sample user training twice a week on two machines."""
+    return make_request(
+        sessions_per_week=2,
+        workout_time=45,
+        available_machines=["rower", "leg standing curl"],
+    )
+
+
+@pytest.fixture
+def make_plan(user_profile: Dict[str, Any]) -> Callable[..., WorkoutPlan]:
+    """Build a plan for the sample user from the given days."""
+    profile = UserProfile(
+        **dict(user_profile, training_frequency=2, workout_time_per_session=45)
+    )
+
+    def make(*days: WorkoutDay) -> WorkoutPlan:
+        return WorkoutPlan(user_profile=profile, weekly_routine=list(days))
+
+    return make
+
+
+def _day(day: str, machine: str, minutes: int) -> WorkoutDay:
+    exercise = Exercise(
+        machine=machine,
+        exercise_name="Exercise",
+        sets=3,
+        reps=10,
+        duration_minutes=minutes,
+        intensity="Medium",
+    )
+    return WorkoutDay(day=day, exercises=[exercise])
+
+
+def test_valid_plan_accepts_canonical_machine_names(
+    chat_request: ChatRequest, make_plan: Callable[..., WorkoutPlan]
+) -> None:
+    """It accepts supplied and canonical machine names within the limits."""
+    plan = make_plan(
+        _day("Monday", "rower", 30), _day("Thursday", "Standing Leg Curl", 45)
+    )
+    assert plan_violations(plan, chat_request) == []
+
+
+def test_plan_rules_are_reported(
+    chat_request: ChatRequest, make_plan: Callable[..., WorkoutPlan]
+) -> None:
+    """It reports long sessions, unknown machines and extra days."""
+    plan = make_plan(
+        _day("Monday", "rower", 50),
+        _day("Wednesday", "treadmill", 20),
+        _day("Friday", "rower", 20),
+    )
+    violations = plan_violations(plan, chat_request)
+    assert len(violations) == 3
+    assert any("Monday takes 50 minutes" in v for v in violations)
+    assert any("'treadmill'" in v for v in violations)
+
+
+def test_plans_with_missing_days_are_reported(
+    chat_request: ChatRequest, make_plan: Callable[..., WorkoutPlan]
+) -> None:
+    """It requires one day per session instead of accepting fewer."""
+    plan = make_plan(_day("Monday", "rower", 30))
+    violations = plan_violations(plan, chat_request)
+    assert violations == ["plan has 1 days for 2 sessions per week"]